@@ -17,6 +17,8 @@ ACCESS_TOKEN_EXPIRE_MINUTES = int(
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/usuarios/login")
+oauth2_scheme_optional = OAuth2PasswordBearer(
+    tokenUrl="/usuarios/login", auto_error=False)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -54,3 +56,10 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         raise credentials_exception
     user["id"] = str(user["_id"])  # convenience
     return user
+
+
+async def get_current_user_optional(token: str | None = Depends(oauth2_scheme_optional)):
+    """Igual a get_current_user, mas retorna None quando não há token."""
+    if not token:
+        return None
+    return await get_current_user(token)
@@ -6,4 +6,23 @@ DB_NAME = os.environ.get("MONGO_DB", "kidsadvisor")
 
 
 client = AsyncIOMotorClient(MONGO_URI)
-db = client[DB_NAME]
\ No newline at end of file
+db = client[DB_NAME]
+
+
+async def ensure_indexes():
+    """Índices das coleções principais (criados no startup da API)."""
+    # Uma inscrição por usuário/evento; também serve a fila de espera (FIFO)
+    await db.event_participants.create_index(
+        [("event_id", 1), ("user_id", 1)], unique=True)
+    await db.event_participants.create_index(
+        [("event_id", 1), ("status", 1), ("created_at", 1), ("_id", 1)])
+    await db.event_participants.create_index(
+        [("event_id", 1), ("created_at", 1), ("_id", 1)])
+    await db.event_participants.create_index(
+        [("user_id", 1), ("status", 1), ("created_at", 1), ("_id", 1)])
+    await db.event_participants.create_index(
+        [("user_id", 1), ("created_at", 1), ("_id", 1)])
+    # Ranking: mesma ordem do leaderboard (xp desc, _id asc)
+    await db.users.create_index([("xp", -1), ("_id", 1)])
+    # listagem/facetas de próximos eventos
+    await db.events.create_index([("end_date", 1), ("start_date", 1)])
@@ -1,6 +1,12 @@
+import asyncio
 from fastapi import FastAPI
-from app.routers import users, events, participations, categories, reactions
-from app.database import client
+from app.routers import users, events, participations, categories, reactions, gamificacao
+from app.database import client, ensure_indexes
+from app.services.reaction_buffer import reaction_buffer
+from app.services.tag_registry import tag_registry
+from app.services.busca import indice_busca
+from app.services.autocomplete import indice_autocomplete
+from app.services import trending, community_tags, leaderboard, geo, arquivamento, scrape_jobs, cascata, alteracoes, gamificacao as gamificacao_engine
 
 app = FastAPI(title="KidsAdvisor API")
 
@@ -11,8 +17,38 @@ app.include_router(participations.router, prefix="/eventos",
 app.include_router(categories.router, prefix="/categories",
                    tags=["categorias"])
 app.include_router(reactions.router, prefix="/eventos", tags=["reações"])
+app.include_router(gamificacao.router, prefix="/gamificacao",
+                   tags=["gamificação"])
+
+
+background_tasks: list[asyncio.Task] = []
+
+
+@app.on_event("startup")
+async def startup_background_tasks():
+    await ensure_indexes()
+    await trending.ensure_indexes()
+    await community_tags.ensure_indexes()
+    await gamificacao_engine.ensure_indexes()
+    await leaderboard.ensure_indexes()
+    await geo.ensure_indexes()
+    await arquivamento.ensure_indexes()
+    await scrape_jobs.ensure_indexes()
+    await cascata.ensure_indexes()
+    await alteracoes.ensure_indexes()
+    await tag_registry.seed()
+    await indice_busca.construir()
+    await indice_autocomplete.construir()
+    reaction_buffer.start()
+    background_tasks.append(asyncio.create_task(trending.run_refresh_loop()))
+    background_tasks.append(asyncio.create_task(arquivamento.run_archive_loop()))
 
 
 @app.on_event("shutdown")
-def shutdown_db_client():
+async def shutdown_db_client():
+    for task in background_tasks:
+        task.cancel()
+    # grava as reações pendentes antes de fechar a conexão
+    await reaction_buffer.stop()
+    scrape_jobs.shutdown()
     client.close()
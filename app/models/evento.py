@@ -44,12 +44,69 @@ class EventCreate(BaseModel):
     category_sec: Optional[Category] = None
     organizer_id: str
     tags: list[str] = []
+    capacity: Optional[int] = Field(None, ge=1)  # None = sem limite de vagas
+
+
+class FriendsGoing(BaseModel):
+    count: int = 0
+    names: list[str] = []
 
 
 class EventOut(EventCreate):
     db_id: str = Field(..., alias="id")  # id interno do Mongo
     created_at: datetime
+    friends_going: Optional[FriendsGoing] = None  # só com `com_amigos=true`
+    distancia_km: Optional[float] = None  # só em /eventos/proximos
 
     class Config:
         allow_population_by_field_name = True
         json_encoders = {datetime: lambda v: v.isoformat()}
+
+
+class EventFieldsOut(BaseModel):
+    """Versão enxuta de EventOut, usada quando o cliente pede `fields=`."""
+    id: str
+    reference_id: Optional[int] = None
+    name: Optional[str] = None
+    detail: Optional[str] = None
+    start_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None
+    private_event: Optional[int] = None
+    published: Optional[int] = None
+    cancelled: Optional[int] = None
+    image: Optional[str] = None
+    url: Optional[str] = None
+    address: Optional[Address] = None
+    host: Optional[Host] = None
+    category_prim: Optional[Category] = None
+    category_sec: Optional[Category] = None
+    organizer_id: Optional[str] = None
+    created_at: Optional[datetime] = None
+    tags: Optional[list[str]] = None
+    capacity: Optional[int] = None
+
+    class Config:
+        json_encoders = {datetime: lambda v: v.isoformat()}
+
+
+class EventBatchOut(BaseModel):
+    events: list[EventOut]
+    missing: list[str] = []
+
+
+class FacetCount(BaseModel):
+    valor: str
+    total: int
+
+
+class FacetsOut(BaseModel):
+    total: int
+    tags: list[FacetCount] = []
+    categorias: list[FacetCount] = []
+    cidades: list[FacetCount] = []
+
+
+class AutocompleteItem(BaseModel):
+    texto: str
+    tipo: str  # "evento" ou "local"
+    event_id: Optional[str] = None
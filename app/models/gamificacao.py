@@ -1,9 +1,9 @@
 from pydantic import BaseModel
 from typing import List
-from app.models.evento import EventoResponse
+from app.models.evento import EventOut
 
 class RecomendacaoResponse(BaseModel):
-    evento: EventoResponse
+    evento: EventOut
     score: float
     tipo: str  # "conteudo", "colaborativo" ou "hibrida"
 
@@ -22,6 +22,12 @@ class LeaderboardEntry(BaseModel):
     nivel: int
     posicao: int
 
+class PosicaoLeaderboard(BaseModel):
+    usuario: LeaderboardEntry
+    total_usuarios: int
+    acima: List[LeaderboardEntry] = []
+    abaixo: List[LeaderboardEntry] = []
+
 class BadgeInfo(BaseModel):
     nome: str
     descricao: str
@@ -0,0 +1,12 @@
+from pydantic import BaseModel
+
+
+class ReactionItem(BaseModel):
+    event_id: str
+    reaction: str
+
+
+class ReactionItemResult(BaseModel):
+    event_id: str
+    reaction: str
+    status: str  # "ok", "reacao_invalida" ou "evento_nao_encontrado"
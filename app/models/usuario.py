@@ -20,6 +20,11 @@ class UserCreate(BaseModel):
     personal_tags: Optional[List[str]] = []
 
 
+class FriendImport(BaseModel):
+    emails: List[EmailStr] = []
+    ids: List[str] = []
+
+
 class UserOut(BaseModel):
     id: str = Field(..., alias="id")
     name: str
@@ -1,43 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from app.database import db
 from app.auth import get_current_user
+from app.services.tag_registry import tag_registry
 
 router = APIRouter()
 
-# Lista fixa de categorias (pré-definidas)
-DEFAULT_TAGS = [
-    "Aventura",
-    "Aquático",
-    "Recreação/Lazer",
-    "Cultural",
-    "Show",
-    "Musical",
-    "Teatro",
-    "Educativo/Científico",
-    "Ar Livre",
-    "Parque Temático",
-    "Indoor/Fechado",
-    "Day Use/Passeio",
-    "Familiar",
-    "Infantil/Crianças",
-    "Esportivo",
-    "Gastronômico",
-    "Oficina/Workshop",
-    "Tecnologia",
-    "Artes",
-    "Dança",
-    "Literatura",
-    "Compras",
-    "Feira",
-    "Festa",
-    "Noturno",
-]
-
 
 @router.get("/", response_model=list[str])
 async def listar_tags():
-    """Retorna as categorias fixas de eventos."""
-    return DEFAULT_TAGS
+    """Retorna as categorias de eventos cadastradas."""
+    return await tag_registry.listar()
 
 
 @router.post("/adicionar", status_code=status.HTTP_201_CREATED)
@@ -47,8 +19,7 @@ async def adicionar_tag(tag: str, current_user=Depends(get_current_user)):
         raise HTTPException(
             status_code=403, detail="Somente administradores podem adicionar tags")
 
-    if tag in DEFAULT_TAGS:
+    if not await tag_registry.adicionar(tag):
         raise HTTPException(status_code=400, detail="Tag já existe")
 
-    DEFAULT_TAGS.append(tag)
     return {"message": f"Tag '{tag}' adicionada com sucesso"}
@@ -1,48 +1,29 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from app.database import db
-from app.auth import get_current_user
-from app.models.evento import EventCreate, EventOut
-from app.services.scraper_clubinho import scrape_all
+from app.auth import get_current_user, get_current_user_optional
+from app.models.evento import EventCreate, EventOut, EventFieldsOut, EventBatchOut, FacetsOut, AutocompleteItem
+from app.services.reaction_buffer import reaction_buffer
+from app.services.amigos_eventos import anotar_amigos
+from app.services import catalogo, facetas
+from app.services.busca import indice_busca
+from app.services.autocomplete import indice_autocomplete, MAX_SUGESTOES
+from app.services import geo, arquivamento, cascata, scrape_jobs
+from app.services.texto import clean_text
 from datetime import datetime
 from bson.objectid import ObjectId
 import httpx
-from app.routers.categories import DEFAULT_TAGS
+from app.services.tag_registry import tag_registry
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
-import re
 from collections import defaultdict
 
 router = APIRouter()
 
-# Stopwords em português para filtros de texto
-stopwords_pt = {
-    "a", "ao", "aos", "aquela", "aquelas", "aquele", "aqueles", "aquilo", "as", "até", "com", "como", "da", "das", "do", "dos", "e", "ela", "elas", "ele", "eles", "em", "entre", "era", "eram", "essa", "essas", "esse", "esses", "esta", "estamos", "estas", "estava", "estavam", "este", "esteja", "estejam", "estejamos", "estes", "esteve", "estive", "estivemos", "estiver", "estivera", "estiveram", "estiverem", "estivermos", "estivesse", "estivessem", "estivéramos", "estivéssemos", "estou", "está", "estão", "eu", "foi", "fomos", "for", "fora", "foram", "forem", "formos", "fosse", "fossem", "fui", "fôramos", "fôssemos", "haja", "hajam", "hajamos", "havemos", "havia", "hei", "houve", "houvemos", "houver", "houvera", "houveram", "houverei", "houverem", "houveremos", "houveria", "houveriam", "houveríamos", "houverão", "houverá", "houveríamos", "houvesse", "houvessem", "houvéramos", "houvéssemos", "há", "hão", "isso", "isto", "já", "lhe", "lhes", "mais", "mas", "me", "mesmo", "meu", "meus", "minha", "minhas", "muito", "na", "nas", "nem", "no", "nos", "nossa", "nossas", "nosso", "nossos", "num", "numa", "não", "nós", "o", "os", "ou", "para", "pela", "pelas", "pelo", "pelos", "por", "qual", "quando", "que", "quem", "se", "seja", "sejam", "sejamos", "sem", "ser", "será", "serão", "seria", "seriam", "será", "serão", "seria", "seriam", "seu", "seus", "só", "sua", "suas", "são", "só", "também", "te", "tem", "temos", "tenha", "tenham", "tenhamos", "tenho", "ter", "terá", "terão", "teria", "teriam", "teve", "tinha", "tinham", "tive", "tivemos", "tiver", "tivera", "tiveram", "tiverem", "tivermos", "tivesse", "tivessem", "tivéramos", "tivéssemos", "tu", "tua", "tuas", "tém", "tínhamos", "um", "uma", "você", "vocês", "vos", "à", "às", "éramos", "é", "são", "está", "estão", "foi", "foram", "será", "serão", "seria", "seriam", "estava", "estavam", "estivera", "estiveram", "esteja", "estejam", "estivesse", "estivessem", "estiver", "estiverem", "hei", "há", "houve", "houverá", "houveria", "houveriam", "houver", "houverem", "houvera", "houveram", "haja", "hajam", "houvesse", "houvessem", "houvéramos", "houvéssemos", "tenho", "tem", "temos", "tém", "tinha", "tinham", "tínhamos", "tive", "tivemos", "teve", "terá", "terão", "teria", "teriam", "ter", "terem", "tera", "teram", "tenha", "tenham", "tenhamos", "tivesse", "tivessem", "tivéramos", "tivéssemos", "tiver", "tiverem", "tivera", "tiveram", "sou", "somos", "era", "éramos", "fui", "fomos", "será", "serão", "seria", "seriam", "seja", "sejam", "sejamos", "fosse", "fossem", "fôramos", "fôssemos", "for", "forem", "formos", "fora", "foram", "sou", "somos", "era", "éramos", "fui", "fomos", "será", "serão", "seria", "seriam", "seja", "sejam", "sejamos", "fosse", "fossem", "fôramos", "fôssemos", "for", "forem", "formos", "fora", "foram"
-}
-
-
-def clean_text(text: str) -> str:
-    """
-    Limpa o texto removendo stopwords em português e caracteres especiais.
-    """
-    if not text:
-        return ""
-
-    # Converte para minúsculas
-    text = text.lower()
-
-    # Remove caracteres especiais e números, mantém apenas letras e espaços
-    text = re.sub(r'[^a-záàâãéèêíìîóòôõúùûç\s]', ' ', text)
-
-    # Remove espaços extras
-    text = re.sub(r'\s+', ' ', text).strip()
-
-    # Remove stopwords
-    words = text.split()
-    filtered_words = [
-        word for word in words if word not in stopwords_pt and len(word) > 2]
-
-    return ' '.join(filtered_words)
+# Limite de ids aceitos por chamada em /eventos/batch
+MAX_BATCH_IDS = 100
 
 
 def event_to_out(event_doc: dict) -> dict:
@@ -69,9 +50,75 @@ def event_to_out(event_doc: dict) -> dict:
         "organizer_id": event_doc.get("organizer_id"),
         "created_at": event_doc.get("created_at"),
         "tags": event_doc.get("tags", []),
+        "capacity": event_doc.get("capacity"),
     }
 
 
+# Campos que o cliente pode pedir via `fields=` (mesmos nomes do documento)
+EVENT_FIELDS = frozenset(EventFieldsOut.__fields__) - {"id"}
+
+
+def parse_fields(fields: str | None) -> list[str] | None:
+    """
+    Converte `fields=name,image,start_date` em uma lista validada de campos.
+    Retorna None quando o cliente não pediu um subconjunto.
+    """
+    if not fields:
+        return None
+
+    requested = []
+    for field in fields.split(","):
+        field = field.strip()
+        if not field or field == "id" or field in requested:
+            continue  # o id sempre é retornado
+        if field not in EVENT_FIELDS:
+            raise HTTPException(
+                status_code=400, detail=f"Campo inválido: {field}")
+        requested.append(field)
+    return requested
+
+
+def build_projection(fields: list[str] | None, extra=()) -> dict | None:
+    """Monta a projeção do Mongo para os campos pedidos (+ os usados internamente)."""
+    if fields is None:
+        return None
+    return {field: 1 for field in (*fields, *extra)}
+
+
+def event_to_fields(event_doc: dict, fields: list[str]) -> dict:
+    """Serializa apenas os campos pedidos, validando com EventFieldsOut."""
+    out = event_to_out(event_doc)
+    data = {"id": out["id"], **{field: out[field] for field in fields}}
+    return EventFieldsOut(**data).dict(exclude_unset=True)
+
+
+def fields_response(content) -> JSONResponse:
+    # Resposta parcial não passa pelo response_model completo (EventOut)
+    return JSONResponse(content=jsonable_encoder(content))
+
+
+def build_event_filter(tag: str | None = None, categoria: str | None = None,
+                       cidade: str | None = None, data_inicio: datetime | None = None,
+                       data_fim: datetime | None = None, futuros: bool = False) -> dict:
+    """Filtro do Mongo para os parâmetros de listagem de eventos."""
+    filtro = {}
+    if tag:
+        filtro["tags"] = tag
+    if categoria:
+        filtro["category_prim.name"] = categoria
+    if cidade:
+        filtro["address.city"] = cidade
+    if data_inicio or data_fim:
+        filtro["start_date"] = {}
+        if data_inicio:
+            filtro["start_date"]["$gte"] = data_inicio
+        if data_fim:
+            filtro["start_date"]["$lte"] = data_fim
+    if futuros:
+        filtro.update(arquivamento.filtro_futuros())
+    return filtro
+
+
 @router.post("/", response_model=EventOut, status_code=status.HTTP_201_CREATED)
 async def create_event(event: EventCreate, current_user=Depends(get_current_user)):
     # apenas admin pode cadastrar
@@ -81,6 +128,10 @@ async def create_event(event: EventCreate, current_user=Depends(get_current_user
 
     doc = event.dict()
     doc["created_at"] = datetime.utcnow()
+    doc["seats_taken"] = 0
+    location = geo.ponto_geojson(doc.get("address"))
+    if location:
+        doc["location"] = location
 
     # --- INÍCIO DA CORREÇÃO ---
     # Converte os campos de URL para string, se existirem
@@ -91,19 +142,38 @@ async def create_event(event: EventCreate, current_user=Depends(get_current_user
         doc["url"] = str(doc["url"])
     # --- FIM DA CORREÇÃO ---
 
-    for tag in event.tags:
-        if tag not in DEFAULT_TAGS:
-            raise HTTPException(status_code=400, detail=f"Tag inválida: {tag}")
+    invalidas = await tag_registry.invalidas(event.tags)
+    if invalidas:
+        raise HTTPException(status_code=400, detail=f"Tag inválida: {invalidas[0]}")
 
     res = await db.events.insert_one(doc)
     created = await db.events.find_one({"_id": res.inserted_id})
+    await catalogo.registrar_escrita(inseridos=[created])
     return event_to_out(created)
 
 
 @router.get("/", response_model=list[EventOut])
-async def list_events():
+async def list_events(fields: str | None = None, com_amigos: bool = False,
+                      tag: str | None = None, categoria: str | None = None,
+                      cidade: str | None = None, data_inicio: datetime | None = None,
+                      data_fim: datetime | None = None, futuros: bool = True,
+                      current_user=Depends(get_current_user_optional)):
+    if com_amigos and current_user is None:
+        raise HTTPException(
+            status_code=401, detail="Faça login para ver amigos nos eventos")
+
+    filtro = build_event_filter(tag, categoria, cidade, data_inicio, data_fim, futuros)
+    requested = parse_fields(fields)
+    if requested is not None:
+        cursor = db.events.find(
+            filtro, build_projection(requested)).sort("start_date", 1)
+        events = [event_to_fields(ev, requested) async for ev in cursor]
+        if com_amigos:
+            await anotar_amigos(current_user, events)
+        return fields_response(events)
+
     events = []
-    async for ev in db.events.find({}).sort("start_date", 1):
+    async for ev in db.events.find(filtro).sort("start_date", 1):
         event_data = event_to_out(ev)
 
         # Conta o número de likes do evento
@@ -124,10 +194,144 @@ async def list_events():
 
         events.append(event_data)
 
+    if com_amigos:
+        await anotar_amigos(current_user, events)
     return events
+
+
+@router.get("/facetas", response_model=FacetsOut)
+async def listar_facetas(tag: str | None = None, categoria: str | None = None,
+                         cidade: str | None = None, data_inicio: datetime | None = None,
+                         data_fim: datetime | None = None):
+    """
+    Contagem dos próximos eventos por tag, categoria principal e cidade,
+    com os mesmos filtros da listagem.
+    """
+    filtro = build_event_filter(tag, categoria, cidade, data_inicio, data_fim, futuros=True)
+    assinatura = (tag, categoria, cidade, data_inicio, data_fim)
+    return await facetas.contar_facetas(filtro, assinatura)
+
+
+# Limite de resultados da busca textual
+MAX_SEARCH_RESULTS = 100
+
+
+@router.get("/busca", response_model=list[EventOut])
+async def buscar_eventos(q: str, tag: str | None = None,
+                         data_inicio: datetime | None = None,
+                         data_fim: datetime | None = None,
+                         limit: int = 20, fields: str | None = None):
+    """
+    Busca textual (BM25) em nome, tags, categorias e descrição dos eventos,
+    usando o índice invertido em memória.
+    """
+    limit = max(1, min(limit, MAX_SEARCH_RESULTS))
+    requested = parse_fields(fields)
+
+    await indice_busca.ensure_current()
+    ranked = indice_busca.buscar(q, limit, tag, data_inicio, data_fim)
+    if not ranked:
+        return fields_response([]) if requested is not None else []
+
+    by_id = {}
+    async for ev in db.events.find(
+        {"_id": {"$in": [ObjectId(event_id) for event_id, _ in ranked]}},
+        build_projection(requested)
+    ):
+        by_id[str(ev["_id"])] = ev
+
+    # Mantém a ordem de relevância; ids removidos desde a indexação são ignorados
+    ordered = [by_id[event_id] for event_id, _ in ranked if event_id in by_id]
+    if requested is not None:
+        return fields_response([event_to_fields(ev, requested) for ev in ordered])
+    return [event_to_out(ev) for ev in ordered]
+
+
+@router.get("/autocomplete", response_model=list[AutocompleteItem])
+async def autocompletar(q: str, limit: int = 8):
+    """Sugestões por prefixo (sem acento) de nomes de eventos e locais, por popularidade."""
+    await indice_autocomplete.ensure_current()
+    return indice_autocomplete.sugerir(q, max(1, min(limit, MAX_SUGESTOES)))
+
+
+# Limites da busca por proximidade
+MAX_RAIO_KM = 100
+MAX_PAGE_SIZE = 100
+
+
+@router.get("/proximos", response_model=list[EventOut])
+async def listar_eventos_proximos(lat: float, lon: float, raio: float = 10,
+                                  tag: str | None = None,
+                                  data_inicio: datetime | None = None,
+                                  data_fim: datetime | None = None,
+                                  futuros: bool = True,
+                                  limit: int = 20, offset: int = 0,
+                                  fields: str | None = None):
+    """
+    Eventos até `raio` km de (lat, lon), do mais próximo ao mais distante,
+    com os filtros da listagem e paginação por limit/offset.
+    """
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise HTTPException(status_code=400, detail="Coordenadas inválidas")
+    if not (0 < raio <= MAX_RAIO_KM):
+        raise HTTPException(
+            status_code=400, detail=f"O raio deve estar entre 0 e {MAX_RAIO_KM} km")
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    requested = parse_fields(fields)
+
+    pipeline = [
+        {"$geoNear": {
+            "near": {"type": "Point", "coordinates": [lon, lat]},
+            "distanceField": "distancia",
+            "maxDistance": raio * 1000,
+            "spherical": True,
+            "query": build_event_filter(tag, None, None, data_inicio, data_fim, futuros),
+        }},
+        {"$skip": max(0, offset)},
+        {"$limit": limit},
+    ]
+    projection = build_projection(requested, ("distancia",))
+    if projection:
+        pipeline.append({"$project": projection})
+
+    events = []
+    async for ev in db.events.aggregate(pipeline):
+        out = event_to_fields(ev, requested) if requested is not None else event_to_out(ev)
+        out["distancia_km"] = round(ev["distancia"] / 1000, 2)
+        events.append(out)
+    return fields_response(events) if requested is not None else events
+
+
+@router.post("/arquivar-encerrados")
+async def arquivar_encerrados(current_user=Depends(get_current_user)):
+    """Executa agora o arquivamento de eventos encerrados (admin)."""
+    if current_user.get("role") != "admin":
+        raise HTTPException(
+            status_code=403, detail="Somente administradores podem arquivar eventos")
+    return {"arquivados": await arquivamento.arquivar_eventos_encerrados()}
+
+
+@router.post("/migrar-localizacao")
+async def migrar_localizacao(current_user=Depends(get_current_user)):
+    """Converte lat/lon em texto no ponto GeoJSON `location` (admin)."""
+    if current_user.get("role") != "admin":
+        raise HTTPException(
+            status_code=403, detail="Somente administradores podem executar a migração")
+    result = await geo.migrar_localizacoes()
+    if result["convertidos"]:
+        await catalogo.marcar_alteracao()
+    return result
 # Importar eventos da Sympla (simplificado)
 
 
+def parse_sympla_date(value):
+    # A Sympla envia "AAAA-MM-DD HH:MM:SS"; guardar como data permite filtrar por end_date
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return value
+
+
 @router.post("/import-sympla")
 async def import_sympla_events(sympla_token: str, current_user=Depends(get_current_user)):
     if current_user.get("role") != "admin":
@@ -145,76 +349,95 @@ async def import_sympla_events(sympla_token: str, current_user=Depends(get_curre
 
         data = resp.json().get("data", [])
         inserted = []
+        inserted_docs = []
         for ev in data:
+            address = ev.get("address") or {}
             doc = {
                 "name": ev.get("name"),
                 "description": ev.get("detail"),
-                "start_date": ev.get("start_date"),
-                "end_date": ev.get("end_date"),
-                "location": ev.get("address", {}).get("name", "Local não informado"),
+                "start_date": parse_sympla_date(ev.get("start_date")),
+                "end_date": parse_sympla_date(ev.get("end_date")),
+                "address": {
+                    "name": address.get("name") or "Local não informado",
+                    "address": address.get("address"),
+                    "city": address.get("city"),
+                    "state": address.get("state"),
+                    # Address guarda coordenadas como texto
+                    "lat": str(address["lat"]) if address.get("lat") is not None else None,
+                    "lon": str(address["lon"]) if address.get("lon") is not None else None,
+                },
                 "organizer_id": str(current_user["_id"]),
                 "sympla_id": ev.get("id"),
                 "created_at": datetime.utcnow()
             }
+            location = geo.ponto_geojson(doc["address"])
+            if location:
+                doc["location"] = location
             # Evita duplicar pelo sympla_id
             exists = await db.events.find_one({"sympla_id": doc["sympla_id"]})
             if not exists:
                 res = await db.events.insert_one(doc)
                 inserted.append(str(res.inserted_id))
+                inserted_docs.append(doc)
+        if inserted:
+            await catalogo.registrar_escrita(inseridos=inserted_docs)
 
         return {"imported": len(inserted), "ids": inserted}
 
 
-@router.post("/scrape-clubinho")
+@router.post("/scrape-clubinho", status_code=status.HTTP_202_ACCEPTED)
 async def scrape_clubinho_events(current_user=Depends(get_current_user)):
+    """
+    Dispara o scraping do Clubinho em segundo plano (processo separado).
+    Retorna o id do job; o progresso fica em /scrape-clubinho/{job_id}.
+    """
     if current_user.get("role") != "admin":
         raise HTTPException(
             status_code=403,
             detail="Somente administradores podem importar eventos"
         )
 
-    raw_events = scrape_all()
+    job_id = await scrape_jobs.iniciar(current_user)
+    if job_id is None:
+        raise HTTPException(
+            status_code=409, detail="Já existe um scraping em andamento")
+    return {"job_id": job_id, "status": "executando"}
 
-    if not raw_events:
-        return {"message": "Nenhum evento encontrado"}
 
-    docs = []
-    for ev in raw_events:
-        doc = {
-            "name": ev.get("name"),
-            "detail": ev.get("detail"),
-            "start_date": ev.get("start_date"),
-            "end_date": ev.get("end_date"),
-            "private_event": ev.get("private_event", 0),
-            "published": ev.get("published", 1),
-            "cancelled": ev.get("cancelled", 0),
-            "image": ev.get("image"),
-            "url": ev.get("url"),
-            "address": ev.get("address"),
-            "host": ev.get("host"),
-            "category_prim": ev.get("category_prim"),
-            "category_sec": ev.get("category_sec"),
-            "organizer_id": str(current_user["_id"]),
-            "created_at": ev.get("created_at", datetime.utcnow()),
-        }
-        docs.append(doc)
+@router.get("/scrape-clubinho/{job_id}")
+async def status_scrape_clubinho(job_id: str, current_user=Depends(get_current_user)):
+    """Progresso do job de scraping, por categoria (eventos coletados e erros)."""
+    if current_user.get("role") != "admin":
+        raise HTTPException(
+            status_code=403,
+            detail="Somente administradores podem importar eventos"
+        )
 
-    result = await db.events.insert_many(docs)
+    job = await scrape_jobs.obter(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    job["job_id"] = job.pop("_id")
+    return job
 
-    return {
-        "message": f"{len(result.inserted_ids)} eventos inseridos",
-        "ids": [str(_id) for _id in result.inserted_ids]
-    }
+
+# Campos usados no cálculo de afinidade das recomendações
+SCORING_FIELDS = ("tags", "community_tags_count",
+                  "category_prim", "category_sec")
 
 
 @router.get("/relacionados")
-async def listar_eventos_relacionados(current_user=Depends(get_current_user)):
+async def listar_eventos_relacionados(fields: str | None = None, com_amigos: bool = False,
+                                      lat: float | None = None, lon: float | None = None,
+                                      current_user=Depends(get_current_user)):
     """
     Retorna eventos relacionados com base em:
     - Eventos curtidos pelo usuário
     - Tags dos eventos e community_tags_count
     - Categorias primária/secundária
+    - Proximidade, quando `lat` e `lon` são informados
     """
+    perto = lat is not None and lon is not None
+    requested = parse_fields(fields)
 
     user_id = ObjectId(current_user["_id"])
 
@@ -233,7 +456,7 @@ async def listar_eventos_relacionados(current_user=Depends(get_current_user)):
     liked_tags = set()
     liked_categories = set()
 
-    async for ev in db.events.find({"_id": {"$in": liked_event_ids}}):
+    async for ev in db.events.find({"_id": {"$in": liked_event_ids}}, dict.fromkeys(SCORING_FIELDS, 1)):
         liked_tags.update(ev.get("tags", []))
 
         # categorias prim/sec
@@ -270,6 +493,7 @@ async def listar_eventos_relacionados(current_user=Depends(get_current_user)):
     related_cursor = db.events.find({
         "$and": [
             {"_id": {"$nin": excluded_event_ids}},
+            arquivamento.filtro_futuros(),
             {
                 "$or": [
                     {"tags": {"$in": list(liked_tags)}},
@@ -278,7 +502,7 @@ async def listar_eventos_relacionados(current_user=Depends(get_current_user)):
                 ]
             }
         ]
-    })
+    }, build_projection(requested, (*SCORING_FIELDS, "location")))
 
     related_events = []
     async for ev in related_cursor:
@@ -300,7 +524,14 @@ async def listar_eventos_relacionados(current_user=Depends(get_current_user)):
         if ev.get("category_sec") and ev["category_sec"].get("name") in liked_categories:
             score += 1
 
-        if score > 0:
+        # bônus que decai com a distância (só com afinidade prévia)
+        if perto and score > 0:
+            score = round(score + geo.bonus_proximidade(ev.get("location"), lat, lon), 3)
+
+        if score > 0 and requested is not None:
+            related_events.append(
+                {**event_to_fields(ev, requested), "score": score})
+        elif score > 0:
             related_events.append({
                 "id": str(ev["_id"]),
                 "name": ev.get("name"),
@@ -314,6 +545,9 @@ async def listar_eventos_relacionados(current_user=Depends(get_current_user)):
     # 🔹 4. Ordena por afinidade
     related_events.sort(key=lambda e: e["score"], reverse=True)
 
+    if com_amigos:
+        await anotar_amigos(current_user, related_events)
+
     return {
         "related_tags": list(liked_tags),
         "related_categories": list(liked_categories),
@@ -322,11 +556,12 @@ async def listar_eventos_relacionados(current_user=Depends(get_current_user)):
 
 
 @router.get("/recomendados-tfidf")
-async def recomendar_eventos_tfidf(current_user=Depends(get_current_user)):
+async def recomendar_eventos_tfidf(fields: str | None = None, com_amigos: bool = False, current_user=Depends(get_current_user)):
     """
     Recomenda eventos usando TF-IDF + Similaridade do Cosseno,
     considerando tags, categorias e descrições.
     """
+    requested = parse_fields(fields)
     user_id = ObjectId(current_user["_id"])
 
     # 🔹 Buscar eventos curtidos e participados
@@ -342,8 +577,9 @@ async def recomendar_eventos_tfidf(current_user=Depends(get_current_user)):
 
     excluded_event_ids = list(set(liked_event_ids + participated_event_ids))
 
-    # 🔹 Buscar todos os eventos publicados
-    events = [e async for e in db.events.find({"published": 1})]
+    # 🔹 Buscar todos os eventos publicados que ainda não terminaram
+    events = [e async for e in db.events.find(
+        {"published": 1, **arquivamento.filtro_futuros()}, build_projection(requested, (*SCORING_FIELDS, "detail")))]
     if not events:
         raise HTTPException(
             status_code=404, detail="Nenhum evento encontrado.")
@@ -417,6 +653,10 @@ async def recomendar_eventos_tfidf(current_user=Depends(get_current_user)):
         score = float(similarities[idx])
         if score <= 0:
             continue
+        if requested is not None:
+            recomendados.append(
+                {**event_to_fields(ev, requested), "score": round(score, 3)})
+            continue
         recomendados.append({
             "id": str(ev["_id"]),
             "name": ev.get("name"),
@@ -427,18 +667,23 @@ async def recomendar_eventos_tfidf(current_user=Depends(get_current_user)):
             "detail": (ev.get("detail") or "")[:120] + "..."
         })
 
+    recomendados = recomendados[:10]  # limita a top 10
+    if com_amigos:
+        await anotar_amigos(current_user, recomendados)
+
     return {
         "user_tags_profile": list(user_tags),
-        "recommended_events": recomendados[:10]  # limita a top 10
+        "recommended_events": recomendados
     }
 
 
 @router.get("/recomendados-colaborativo")
-async def recomendar_eventos_colaborativo(current_user=Depends(get_current_user)):
+async def recomendar_eventos_colaborativo(fields: str | None = None, com_amigos: bool = False, current_user=Depends(get_current_user)):
     """
     Recomenda eventos com base em filtragem colaborativa.
     Usa similaridade entre usuários (curtidas e participações em comum).
     """
+    requested = parse_fields(fields)
 
     user_id = ObjectId(current_user["_id"])
 
@@ -507,7 +752,11 @@ async def recomendar_eventos_colaborativo(current_user=Depends(get_current_user)
 
     # 🔹 8. Buscar dados dos eventos recomendados
     recommended_events = []
-    async for ev in db.events.find({"_id": {"$in": [ObjectId(eid) for eid in recommended_event_ids]}}):
+    # (o histórico inclui eventos arquivados; só os próximos são recomendados)
+    async for ev in db.events.find({"_id": {"$in": [ObjectId(eid) for eid in recommended_event_ids]}, **arquivamento.filtro_futuros()}, build_projection(requested)):
+        if requested is not None:
+            recommended_events.append(event_to_fields(ev, requested))
+            continue
         recommended_events.append({
             "id": str(ev["_id"]),
             "name": ev.get("name"),
@@ -517,25 +766,80 @@ async def recomendar_eventos_colaborativo(current_user=Depends(get_current_user)
             "detail": (ev.get("detail") or "")[:120] + "..."
         })
 
+    recommended_events = recommended_events[:10]  # top 10
+    if com_amigos:
+        await anotar_amigos(current_user, recommended_events)
+
     return {
         "method": "filtragem_colaborativa",
         "similar_users_count": len(similar_users),
-        "recommended_events": recommended_events[:10]  # top 10
+        "recommended_events": recommended_events
     }
 
 
-@router.delete("/{event_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_event(event_id: str, current_user=Depends(get_current_user)):
+@router.post("/batch", response_model=EventBatchOut)
+async def get_events_batch(ids: list[str], fields: str | None = None):
+    """
+    Resolve vários eventos em uma única consulta `$in`.
+    A resposta preserva a ordem dos ids pedidos e informa os que não existem
+    (nem em `events`, nem em `events_archive`).
+    """
+    if len(ids) > MAX_BATCH_IDS:
+        raise HTTPException(
+            status_code=400, detail=f"Informe no máximo {MAX_BATCH_IDS} ids")
+
+    requested = parse_fields(fields)
+    ordered_ids = list(dict.fromkeys(ids))  # remove repetidos, mantém ordem
+    object_ids = [ObjectId(i) for i in ordered_ids if ObjectId.is_valid(i)]
+
+    found = {}
+    async for ev in db.events.find({"_id": {"$in": object_ids}}, build_projection(requested)):
+        found[str(ev["_id"])] = ev
+
+    # Como no get_event_by_id: eventos encerrados continuam acessíveis pelo id
+    faltando = [oid for oid in object_ids if str(oid) not in found]
+    if faltando:
+        async for ev in db.events_archive.find({"_id": {"$in": faltando}}, build_projection(requested)):
+            found[str(ev["_id"])] = ev
+
+    events = []
+    missing = []
+    for event_id in ordered_ids:
+        ev = found.get(event_id)
+        if ev is None:
+            missing.append(event_id)
+        elif requested is not None:
+            events.append(event_to_fields(ev, requested))
+        else:
+            events.append(event_to_out(ev))
+
+    if requested is not None:
+        return fields_response({"events": events, "missing": missing})
+    return {"events": events, "missing": missing}
+
+
+@router.post("/orfaos/varrer", status_code=status.HTTP_202_ACCEPTED)
+async def varrer_orfaos(current_user=Depends(get_current_user)):
+    """Remove reações/inscrições/votos de eventos que não existem mais (admin)."""
     if current_user.get("role") != "admin":
         raise HTTPException(
-            status_code=403, detail="Somente administradores podem deletar eventos")
+            status_code=403, detail="Somente administradores podem executar a varredura")
+    if not await cascata.iniciar_varredura():
+        raise HTTPException(
+            status_code=409, detail="Já existe uma varredura em andamento")
+    return {"message": "Varredura iniciada"}
 
-    res = await db.events.delete_one({"_id": ObjectId(event_id)})
-    if res.deleted_count == 0:
-        raise HTTPException(status_code=404, detail="Evento não encontrado")
-    return
+
+@router.get("/orfaos/status")
+async def status_varredura_orfaos(current_user=Depends(get_current_user)):
+    """Progresso da varredura de órfãos, por coleção."""
+    if current_user.get("role") != "admin":
+        raise HTTPException(
+            status_code=403, detail="Somente administradores podem ver a varredura")
+    return await cascata.progresso()
 
 
+# Registrada antes de DELETE /{event_id}, senão "eventos" seria lido como id
 @router.delete("/eventos", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_all_events(current_user=Depends(get_current_user)):
     if current_user.get("role") != "admin":
@@ -543,12 +847,37 @@ async def delete_all_events(current_user=Depends(get_current_user)):
             status_code=403, detail="Somente administradores podem deletar eventos")
 
     await db.events.delete_many({})
+    await catalogo.registrar_escrita(limpar=True)
+    # Tudo que não aponta para um evento (ativo ou arquivado) é removido
+    await cascata.iniciar_varredura()
+    return
+
+
+@router.delete("/{event_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_event(event_id: str, background_tasks: BackgroundTasks, current_user=Depends(get_current_user)):
+    if current_user.get("role") != "admin":
+        raise HTTPException(
+            status_code=403, detail="Somente administradores podem deletar eventos")
+
+    res = await db.events.delete_one({"_id": ObjectId(event_id)})
+    if res.deleted_count == 0:
+        raise HTTPException(status_code=404, detail="Evento não encontrado")
+    reaction_buffer.forget_event(event_id)
+    await catalogo.registrar_escrita(removidos=[event_id])
+    # Reações, inscrições e votos do evento saem em segundo plano
+    background_tasks.add_task(cascata.remover_dependentes, [ObjectId(event_id)])
     return
 
 
 @router.get("/{event_id}", response_model=EventOut)
-async def get_event_by_id(event_id: str):
-    event = await db.events.find_one({"_id": ObjectId(event_id)})
+async def get_event_by_id(event_id: str, fields: str | None = None):
+    requested = parse_fields(fields)
+    event = await db.events.find_one({"_id": ObjectId(event_id)}, build_projection(requested))
+    if not event:
+        # Eventos encerrados continuam acessíveis pelo id
+        event = await db.events_archive.find_one({"_id": ObjectId(event_id)}, build_projection(requested))
     if not event:
         raise HTTPException(status_code=404, detail="Evento não encontrado")
+    if requested is not None:
+        return fields_response(event_to_fields(event, requested))
     return event_to_out(event)
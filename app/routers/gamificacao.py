@@ -1,12 +1,13 @@
 from fastapi import APIRouter, HTTPException, Depends, status
 from typing import List
-from app.database import get_database
+from app.database import db
 from app.auth import get_current_user
-from app.services.gamificacao import GamificacaoService
-from app.models.gamificacao import ProgressoResponse, LeaderboardEntry, BadgeInfo
+from app.services.gamificacao import gamificacao_service
+from app.models.gamificacao import ProgressoResponse, LeaderboardEntry, BadgeInfo, PosicaoLeaderboard
+from app.services.leaderboard import leaderboard, top_periodo, ranking_amigos
+from bson import ObjectId
 
 router = APIRouter()
-gamificacao_service = GamificacaoService()
 
 @router.get("/usuarios/{usuario_id}/progresso", response_model=ProgressoResponse)
 async def obter_progresso_usuario(
@@ -14,19 +15,13 @@ async def obter_progresso_usuario(
     current_user: dict = Depends(get_current_user)
 ):
     """Obtém o progresso completo do usuário"""
-    db = get_database()
-    
-    # Verificar se o usuário existe
-    usuario = await db.usuarios.find_one({"_id": usuario_id})
-    if not usuario:
+    progresso = await gamificacao_service.obter_progresso_usuario(usuario_id)
+    if progresso is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Usuário não encontrado"
         )
     
-    # Obter progresso
-    progresso = await gamificacao_service.obter_progresso_usuario(usuario_id)
-    
     return progresso
 
 @router.get("/leaderboard", response_model=List[LeaderboardEntry])
@@ -35,8 +30,43 @@ async def obter_leaderboard(
     current_user: dict = Depends(get_current_user)
 ):
     """Obtém o ranking dos usuários"""
-    leaderboard = await gamificacao_service.obter_leaderboard(limit)
-    return leaderboard
+    return await gamificacao_service.obter_leaderboard(min(limit, 100))
+
+@router.get("/leaderboard/semanal", response_model=List[LeaderboardEntry])
+async def obter_leaderboard_semanal(
+    limit: int = 10,
+    current_user: dict = Depends(get_current_user)
+):
+    """Obtém o ranking pelo XP ganho na semana atual"""
+    return await top_periodo("semanal", min(limit, 100))
+
+@router.get("/leaderboard/mensal", response_model=List[LeaderboardEntry])
+async def obter_leaderboard_mensal(
+    limit: int = 10,
+    current_user: dict = Depends(get_current_user)
+):
+    """Obtém o ranking pelo XP ganho no mês atual"""
+    return await top_periodo("mensal", min(limit, 100))
+
+@router.get("/leaderboard/amigos", response_model=List[LeaderboardEntry])
+async def obter_leaderboard_amigos(current_user: dict = Depends(get_current_user)):
+    """Obtém o ranking entre o usuário autenticado e seus amigos"""
+    return await ranking_amigos(current_user)
+
+@router.get("/leaderboard/posicao/{usuario_id}", response_model=PosicaoLeaderboard)
+async def obter_posicao_leaderboard(
+    usuario_id: str,
+    vizinhos: int = 0,
+    current_user: dict = Depends(get_current_user)
+):
+    """Obtém a posição do usuário no ranking e os vizinhos acima e abaixo dele"""
+    posicao = await leaderboard.posicao(usuario_id, max(0, min(vizinhos, 25)))
+    if posicao is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Usuário não encontrado"
+        )
+    return posicao
 
 @router.get("/usuarios/{usuario_id}/badges", response_model=List[BadgeInfo])
 async def obter_badges_usuario(
@@ -44,10 +74,8 @@ async def obter_badges_usuario(
     current_user: dict = Depends(get_current_user)
 ):
     """Obtém informações sobre badges do usuário"""
-    db = get_database()
-    
     # Verificar se o usuário existe
-    usuario = await db.usuarios.find_one({"_id": usuario_id})
+    usuario = await db.users.find_one({"_id": ObjectId(usuario_id)}, {"xp": 1, "level": 1})
     if not usuario:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -65,10 +93,8 @@ async def verificar_badges_usuario(
     current_user: dict = Depends(get_current_user)
 ):
     """Verifica e concede novos badges para o usuário"""
-    db = get_database()
-    
     # Verificar se o usuário existe
-    usuario = await db.usuarios.find_one({"_id": usuario_id})
+    usuario = await db.users.find_one({"_id": ObjectId(usuario_id)}, {"xp": 1, "level": 1})
     if not usuario:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -87,16 +113,34 @@ async def verificar_badges_usuario(
         "message": f"Conquistados {len(novos_badges)} novos badges!"
     }
 
+@router.post("/badges/{badge_id}/backfill")
+async def backfill_badge(
+    badge_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Concede um badge a todos os usuários que já cumprem a regra (admin)"""
+    if current_user.get("role") != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Somente administradores podem executar o backfill"
+        )
+    if badge_id not in gamificacao_service.BADGES:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Badge não encontrado"
+        )
+
+    concedidos = await gamificacao_service.backfill_badge(badge_id)
+    return {"badge": badge_id, "concedidos": concedidos}
+
 @router.get("/usuarios/{usuario_id}/nivel")
 async def obter_nivel_usuario(
     usuario_id: str,
     current_user: dict = Depends(get_current_user)
 ):
     """Obtém informações sobre o nível do usuário"""
-    db = get_database()
-    
     # Verificar se o usuário existe
-    usuario = await db.usuarios.find_one({"_id": usuario_id})
+    usuario = await db.users.find_one({"_id": ObjectId(usuario_id)}, {"xp": 1, "level": 1})
     if not usuario:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -104,8 +148,8 @@ async def obter_nivel_usuario(
         )
     
     xp = usuario.get("xp", 0)
-    nivel_atual = await gamificacao_service.calcular_nivel(xp)
-    proximo_nivel_xp = await gamificacao_service.obter_proximo_nivel_xp(nivel_atual)
+    nivel_atual = usuario.get("level") or gamificacao_service.calcular_nivel(xp)
+    proximo_nivel_xp = gamificacao_service.obter_proximo_nivel_xp(nivel_atual)
     xp_necessario = proximo_nivel_xp - xp
     
     return {
@@ -1,91 +1,252 @@
-from app.routers.categories import DEFAULT_TAGS
-from fastapi import APIRouter, Depends, HTTPException, status
+from app.services.tag_registry import tag_registry
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
 from app.database import db
 from app.auth import get_current_user
 from bson import ObjectId
 from datetime import datetime
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from app.services import trending, community_tags, participacoes, feed
+from app.services.gamificacao import gamificacao_service
 
 router = APIRouter()
 
 
-@router.post("/{event_id}/inscrever")
-async def inscrever_evento(event_id: str, current_user=Depends(get_current_user)):
-    """Usuário logado se inscreve em um evento"""
+async def reservar_vaga(event_id: ObjectId) -> bool:
+    """
+    Reserva uma vaga com um único update condicional no contador do evento.
+    Eventos sem `capacity` sempre têm vaga e não usam o contador, então
+    inscrições simultâneas não disputam a escrita no mesmo documento.
+    """
+    reserved = await db.events.find_one_and_update(
+        {
+            "_id": event_id,
+            "capacity": {"$ne": None},
+            "$expr": {"$lt": ["$seats_taken", "$capacity"]}
+        },
+        {"$inc": {"seats_taken": 1}},
+        projection={"_id": 1}
+    )
+    if reserved is not None:
+        return True
+    # Sem reserva: lotado, inexistente ou sem limite (só leitura)
+    event = await db.events.find_one({"_id": event_id}, {"capacity": 1})
+    return event is not None and event.get("capacity") is None
 
-    # Verifica se evento existe
-    event = await db.events.find_one({"_id": ObjectId(event_id)})
-    if not event:
-        raise HTTPException(status_code=404, detail="Evento não encontrado")
 
-    # Evita duplicação
-    exists = await db.event_participants.find_one({
-        "event_id": ObjectId(event_id),
-        "user_id": ObjectId(current_user["_id"])
-    })
-    if exists:
-        raise HTTPException(
-            status_code=400, detail="Usuário já inscrito neste evento")
+async def liberar_vaga(event_id: ObjectId):
+    await db.events.update_one(
+        {"_id": event_id, "capacity": {"$ne": None}, "seats_taken": {"$gt": 0}},
+        {"$inc": {"seats_taken": -1}}
+    )
+
+
+async def promover_mais_antigo(event_oid: ObjectId, event_id: str) -> dict | None:
+    """Passa o primeiro da lista de espera para confirmado (a vaga já deve estar reservada)."""
+    promoted = await db.event_participants.find_one_and_update(
+        {"event_id": event_oid, "status": "waitlist"},
+        {"$set": {"status": "confirmed", "promoted_at": datetime.utcnow()}},
+        sort=[("created_at", 1)],
+        projection={"user_id": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if promoted is not None:
+        await participacoes.mover_contadores(
+            event_oid, promoted["user_id"], "waitlist", "confirmed")
+        await trending.record_activity(event_id, "participations")
+        await gamificacao_service.conceder_xp(promoted["user_id"], "participacao", event_id)
+    return promoted
+
 
+@router.post("/{event_id}/inscrever")
+async def inscrever_evento(event_id: str, background_tasks: BackgroundTasks, current_user=Depends(get_current_user)):
+    """
+    Usuário logado se inscreve em um evento.
+    Se o evento estiver lotado, o usuário entra na lista de espera.
+    """
+    event_oid = ObjectId(event_id)
     doc = {
-        "event_id": ObjectId(event_id),
+        "event_id": event_oid,
         "user_id": ObjectId(current_user["_id"]),
         "status": "confirmed",
         "created_at": datetime.utcnow()
     }
-    res = await db.event_participants.insert_one(doc)
 
-    return {"message": "Inscrição realizada com sucesso", "id": str(res.inserted_id)}
+    if not await reservar_vaga(event_oid):
+        # Sem vaga: ou o evento não existe, ou está lotado
+        if not await db.events.find_one({"_id": event_oid}, {"_id": 1}):
+            raise HTTPException(
+                status_code=404, detail="Evento não encontrado")
+
+        doc["status"] = "waitlist"
+        try:
+            res = await db.event_participants.insert_one(doc)
+        except DuplicateKeyError:
+            raise HTTPException(
+                status_code=400, detail="Usuário já inscrito neste evento")
+        await participacoes.ajustar_contadores(event_oid, doc["user_id"], "waitlist", 1)
+
+        # Uma vaga liberada entre a reserva e a entrada na fila (com a fila
+        # vazia) voltou ao contador: repassa para quem está esperando
+        while await reservar_vaga(event_oid):
+            if await promover_mais_antigo(event_oid, event_id) is None:
+                await liberar_vaga(event_oid)
+                break
+
+        atual = await db.event_participants.find_one({"_id": res.inserted_id}, {"status": 1})
+        if atual is not None and atual["status"] == "confirmed":
+            return {"message": "Inscrição realizada com sucesso", "id": str(res.inserted_id), "status": "confirmed"}
+
+        posicao = await db.event_participants.count_documents({
+            "event_id": event_oid,
+            "status": "waitlist",
+            "created_at": {"$lte": doc["created_at"]}
+        })
+        return {
+            "message": "Evento lotado: você entrou na lista de espera",
+            "id": str(res.inserted_id),
+            "status": "waitlist",
+            "posicao_espera": posicao
+        }
+
+    # O índice único (event_id, user_id) evita inscrição duplicada
+    try:
+        res = await db.event_participants.insert_one(doc)
+    except DuplicateKeyError:
+        await liberar_vaga(event_oid)
+        raise HTTPException(
+            status_code=400, detail="Usuário já inscrito neste evento")
+
+    await participacoes.ajustar_contadores(event_oid, doc["user_id"], "confirmed", 1)
+    await trending.record_activity(event_id, "participations")
+    await gamificacao_service.conceder_xp(doc["user_id"], "participacao", event_id)
+    background_tasks.add_task(
+        feed.publicar, current_user, "inscricao", event_id=event_id)
+
+    return {"message": "Inscrição realizada com sucesso", "id": str(res.inserted_id), "status": "confirmed"}
 
 
 @router.delete("/{event_id}/cancelar")
 async def cancelar_inscricao(event_id: str, current_user=Depends(get_current_user)):
-    """Usuário logado cancela sua inscrição em um evento"""
-
-    res = await db.event_participants.delete_one({
-        "event_id": ObjectId(event_id),
-        "user_id": ObjectId(current_user["_id"])
-    })
+    """
+    Usuário logado cancela sua inscrição em um evento.
+    A vaga liberada passa para o primeiro da lista de espera.
+    """
+    event_oid = ObjectId(event_id)
+    user_oid = ObjectId(current_user["_id"])
+    removed = await db.event_participants.find_one_and_delete({
+        "event_id": event_oid,
+        "user_id": user_oid
+    }, projection={"status": 1})
 
-    if res.deleted_count == 0:
+    if removed is None:
         raise HTTPException(status_code=404, detail="Inscrição não encontrada")
+    await participacoes.ajustar_contadores(event_oid, user_oid, removed.get("status"), -1)
+
+    if removed.get("status") == "confirmed":
+        # A vaga é transferida sem passar pelo contador, então ninguém fura a fila
+        if await promover_mais_antigo(event_oid, event_id) is None:
+            await liberar_vaga(event_oid)
 
     return {"message": "Inscrição cancelada com sucesso"}
 
 
 @router.get("/usuarios/{user_id}/eventos")
-async def listar_eventos_usuario(user_id: str, current_user=Depends(get_current_user)):
-    """Lista todos os eventos em que um usuário está inscrito"""
+async def listar_eventos_usuario(
+    user_id: str,
+    status: str | None = None,
+    limit: int = 20,
+    cursor: str | None = None,
+    current_user=Depends(get_current_user)
+):
+    """Lista (paginado) os eventos em que um usuário está inscrito"""
+    return await paginar_eventos_do_usuario(ObjectId(user_id), status, limit, cursor)
 
-    participations = []
-    async for p in db.event_participants.find({"user_id": ObjectId(user_id)}):
-        event = await db.events.find_one({"_id": p["event_id"]})
-        if event:
-            participations.append({
-                "event_id": str(event["_id"]),
-                "event_name": event.get("name"),
-                "status": p.get("status"),
-                "inscrito_em": p.get("created_at")
-            })
 
-    return participations
+@router.get("/{event_id}/participantes")
+async def listar_participantes_evento(
+    event_id: str,
+    status: str | None = None,
+    limit: int = 20,
+    cursor: str | None = None,
+    current_user=Depends(get_current_user)
+):
+    """Lista (paginado) os usuários inscritos em um evento"""
+    validar_status(status)
+    event_oid = ObjectId(event_id)
 
+    match = {"event_id": event_oid}
+    if status:
+        match["status"] = status
 
-@router.get("/{event_id}/participantes")
-async def listar_participantes_evento(event_id: str, current_user=Depends(get_current_user)):
-    """Lista todos os usuários inscritos em um evento"""
+    docs, next_cursor = await participacoes.listar_pagina(
+        match,
+        participacoes.lookup_projetado("users", "user_id", {"name": 1}),
+        limit, validar_cursor(cursor)
+    )
+
+    # total vem do contador mantido no evento (sem count_documents)
+    event = await db.events.find_one({"_id": event_oid}, {"participant_counts": 1})
+    if not event:
+        raise HTTPException(status_code=404, detail="Evento não encontrado")
 
-    participants = []
-    async for p in db.event_participants.find({"event_id": ObjectId(event_id)}):
-        user = await db.users.find_one({"_id": p["user_id"]})
-        if user:
-            participants.append({
-                "user_id": str(user["_id"]),
-                "user_name": user.get("name"),
-                "status": p.get("status"),
-                "inscrito_em": p.get("created_at")
-            })
+    return {
+        "items": [{
+            "user_id": str(p["user_id"]),
+            "user_name": p["related"].get("name"),
+            "status": p.get("status"),
+            "inscrito_em": p.get("created_at")
+        } for p in docs],
+        "total": participacoes.total_from_counts(event.get("participant_counts"), status),
+        "next_cursor": next_cursor
+    }
 
-    return participants
+
+def validar_status(status: str | None):
+    if status and status not in participacoes.STATUSES:
+        raise HTTPException(
+            status_code=400, detail=f"Status inválido: {status}")
+
+
+def validar_cursor(cursor: str | None) -> str | None:
+    if cursor:
+        try:
+            participacoes.decode_cursor(cursor)
+        except Exception:
+            raise HTTPException(status_code=400, detail="Cursor inválido")
+    return cursor
+
+
+async def paginar_eventos_do_usuario(user_oid: ObjectId, status: str | None, limit: int, cursor: str | None):
+    validar_status(status)
+
+    match = {"user_id": user_oid}
+    if status:
+        match["status"] = status
+
+    docs, next_cursor = await participacoes.listar_pagina(
+        match,
+        participacoes.lookup_projetado("events", "event_id", {"name": 1}),
+        limit, validar_cursor(cursor),
+        # Inscrições em eventos encerrados continuam no histórico
+        arquivo=("events_archive", "event_id", {"name": 1})
+    )
+
+    user = await db.users.find_one({"_id": user_oid}, {"participation_counts": 1})
+    if not user:
+        raise HTTPException(status_code=404, detail="Usuário não encontrado")
+
+    return {
+        "items": [{
+            "event_id": str(p["event_id"]),
+            "event_name": p["related"].get("name"),
+            "arquivado": p["arquivado"],
+            "status": p.get("status"),
+            "inscrito_em": p.get("created_at")
+        } for p in docs],
+        "total": participacoes.total_from_counts(user.get("participation_counts"), status),
+        "next_cursor": next_cursor
+    }
 
 
 @router.post("/{event_id}/classificar-tags")
@@ -97,62 +258,78 @@ async def classificar_tags_evento(
     """
     Usuário participante pode classificar um evento com até 3 tags.
     As tags são agregadas no campo 'community_tags_count' do evento.
+    Votar de novo substitui o voto anterior (as contagens são ajustadas).
     """
+    tags = list(dict.fromkeys(tags))  # ignora tags repetidas
     # ✅ valida quantidade
     if not (1 <= len(tags) <= 3):
         raise HTTPException(
             status_code=400, detail="Escolha entre 1 e 3 tags.")
 
     # ✅ valida tags válidas
-    for tag in tags:
-        if tag not in DEFAULT_TAGS:
-            raise HTTPException(status_code=400, detail=f"Tag inválida: {tag}")
-
-    # ✅ verifica se evento existe
-    event = await db.events.find_one({"_id": ObjectId(event_id)})
-    if not event:
-        raise HTTPException(status_code=404, detail="Evento não encontrado.")
+    invalidas = await tag_registry.invalidas(tags)
+    if invalidas:
+        raise HTTPException(status_code=400, detail=f"Tag inválida: {invalidas[0]}")
 
     # ✅ verifica se usuário participou do evento
     participou = await db.event_participants.find_one({
         "event_id": ObjectId(event_id),
         "user_id": ObjectId(current_user["_id"]),
         "status": "confirmed"
-    })
+    }, {"_id": 1})
     if not participou:
+        # só consulta o evento para diferenciar 404 de 403
+        if not await db.events.find_one({"_id": ObjectId(event_id)}, {"_id": 1}):
+            raise HTTPException(
+                status_code=404, detail="Evento não encontrado.")
         raise HTTPException(
             status_code=403,
             detail="Apenas usuários que participaram do evento podem classificá-lo."
         )
 
-    # ✅ cria ou atualiza campo de contagem
-    community_tags = event.get("community_tags_count", {})
-
-    for tag in tags:
-        community_tags[tag] = community_tags.get(tag, 0) + 1
+    # ✅ registra o voto no ledger e aplica a diferença com $inc
+    result = await community_tags.registrar_voto(
+        ObjectId(current_user["_id"]), ObjectId(event_id), tags)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Evento não encontrado.")
 
-    await db.events.update_one(
-        {"_id": ObjectId(event_id)},
-        {"$set": {"community_tags_count": community_tags}}
-    )
+    if result["added"]:
+        await trending.record_activity(event_id, "tag_votes", len(result["added"]))
+    await gamificacao_service.conceder_xp(current_user["_id"], "voto_tags", event_id)
+    await gamificacao_service.registrar_tags_votadas(current_user["_id"], tags)
 
     return {
         "message": "Classificação registrada com sucesso.",
-        "community_tags_count": community_tags
+        "community_tags_count": result["community_tags_count"]
     }
 
 
+@router.post("/tags-comunidade/reconciliar")
+async def reconciliar_tags_comunidade(current_user=Depends(get_current_user)):
+    """Reconstrói o community_tags_count dos eventos a partir do ledger de votos."""
+    if current_user.get("role") != "admin":
+        raise HTTPException(
+            status_code=403, detail="Somente administradores podem reconciliar tags")
+
+    updated = await community_tags.reconstruir_contagens()
+    return {"message": f"{updated} eventos reconciliados"}
+
+
 @router.get("/me/eventos")
-async def listar_meus_eventos(current_user=Depends(get_current_user)):
-    """Lista todos os eventos em que o usuário autenticado está inscrito"""
-    participations = []
-    async for p in db.event_participants.find({"user_id": ObjectId(current_user["_id"])}):
-        event = await db.events.find_one({"_id": p["event_id"]})
-        if event:
-            participations.append({
-                "event_id": str(event["_id"]),
-                "event_name": event.get("name"),
-                "status": p.get("status"),
-                "inscrito_em": p.get("created_at")
-            })
-    return participations
+async def listar_meus_eventos(
+    status: str | None = None,
+    limit: int = 20,
+    cursor: str | None = None,
+    current_user=Depends(get_current_user)
+):
+    """Lista (paginado) os eventos em que o usuário autenticado está inscrito"""
+    return await paginar_eventos_do_usuario(ObjectId(current_user["_id"]), status, limit, cursor)
+
+
+@router.post("/participacoes/reconstruir-contadores")
+async def reconstruir_contadores_participacoes(current_user=Depends(get_current_user)):
+    """Recalcula os contadores de inscrições de eventos e usuários (admin)."""
+    if current_user.get("role") != "admin":
+        raise HTTPException(
+            status_code=403, detail="Somente administradores podem reconstruir contadores")
+    return await participacoes.reconstruir_contadores()
@@ -1,14 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
 from app.database import db
 from app.auth import get_current_user
+from app.models.reacao import ReactionItem, ReactionItemResult
+from app.services.reaction_buffer import reaction_buffer, BufferCheio, likes_existentes
+from app.services import trending, feed
+from app.services.gamificacao import gamificacao_service
 from bson import ObjectId
 from datetime import datetime
+from pymongo import UpdateOne, ReturnDocument
 
 router = APIRouter()
 
+# Limite de itens aceitos por chamada em /reacoes/lote
+MAX_BULK_REACTIONS = 500
+
 
 @router.post("/{event_id}/reagir")
-async def reagir_evento(event_id: str, reaction: str, current_user=Depends(get_current_user)):
+async def reagir_evento(event_id: str, reaction: str, background_tasks: BackgroundTasks, current_user=Depends(get_current_user)):
     """
     Permite que o usuário reaja (like/dislike) a um evento.
     Se o usuário já tiver reagido, a reação é atualizada.
@@ -17,13 +25,25 @@ async def reagir_evento(event_id: str, reaction: str, current_user=Depends(get_c
         raise HTTPException(
             status_code=400, detail="Reação inválida. Use 'like' ou 'dislike'.")
 
+    if reaction_buffer.enabled:
+        # Modo write-behind: valida pelo cache de ids e agrupa em memória
+        if not await reaction_buffer.event_exists(event_id):
+            raise HTTPException(status_code=404, detail="Evento não encontrado")
+        try:
+            await reaction_buffer.add(str(current_user["_id"]), event_id, reaction)
+        except BufferCheio:
+            raise HTTPException(
+                status_code=503, detail="Muitas reações no momento, tente novamente",
+                headers={"Retry-After": "1"})
+        return {"message": f"Evento marcado como {reaction}"}
+
     # Verifica se o evento existe
     event = await db.events.find_one({"_id": ObjectId(event_id)})
     if not event:
         raise HTTPException(status_code=404, detail="Evento não encontrado")
 
-    # Cria ou atualiza a reação do usuário
-    await db.event_reactions.update_one(
+    # Cria ou atualiza a reação do usuário (devolve a reação anterior)
+    previous = await db.event_reactions.find_one_and_update(
         {"user_id": ObjectId(current_user["_id"]),
          "event_id": ObjectId(event_id)},
         {
@@ -32,46 +52,147 @@ async def reagir_evento(event_id: str, reaction: str, current_user=Depends(get_c
                 "created_at": datetime.utcnow()
             }
         },
-        upsert=True
+        upsert=True,
+        return_document=ReturnDocument.BEFORE
     )
 
+    # Só conta para o trending quando vira like (evita inflar com alternâncias)
+    if reaction == "like" and (not previous or previous.get("reaction") != "like"):
+        await trending.record_activity(event_id, "likes")
+        await gamificacao_service.conceder_xp(current_user["_id"], "like", event_id)
+        background_tasks.add_task(
+            feed.publicar, current_user, "like", event_id=event_id)
+
     return {"message": f"Evento marcado como {reaction}"}
 
 
+@router.post("/reacoes/lote", response_model=list[ReactionItemResult])
+async def reagir_eventos_lote(items: list[ReactionItem], current_user=Depends(get_current_user)):
+    """
+    Aplica várias reações de uma vez (ex.: sincronização offline do app).
+    Os eventos são validados com um único `$in` e as reações gravadas com um
+    único `bulk_write` não ordenado. Retorna o resultado de cada item.
+    """
+    if len(items) > MAX_BULK_REACTIONS:
+        raise HTTPException(
+            status_code=400, detail=f"Envie no máximo {MAX_BULK_REACTIONS} reações")
+
+    user_id = ObjectId(current_user["_id"])
+    candidate_ids = {ObjectId(i.event_id) for i in items
+                     if ObjectId.is_valid(i.event_id)}
+    existing_ids = {str(ev["_id"]) async for ev in db.events.find(
+        {"_id": {"$in": list(candidate_ids)}}, {"_id": 1})}
+
+    results = []
+    latest = {}  # event_id -> reação (a última do lote vence)
+    for item in items:
+        if item.reaction not in ["like", "dislike"]:
+            item_status = "reacao_invalida"
+        elif item.event_id not in existing_ids:
+            item_status = "evento_nao_encontrado"
+        else:
+            item_status = "ok"
+            latest[item.event_id] = item.reaction
+        results.append({"event_id": item.event_id,
+                       "reaction": item.reaction, "status": item_status})
+
+    if latest:
+        now = datetime.utcnow()
+        user_str = str(user_id)
+        ja_curtidos = await likes_existentes(
+            (user_str, eid) for eid, reaction in latest.items() if reaction == "like")
+        await db.event_reactions.bulk_write([
+            UpdateOne(
+                {"user_id": user_id, "event_id": ObjectId(event_id)},
+                {"$set": {"reaction": reaction, "created_at": now}},
+                upsert=True
+            )
+            for event_id, reaction in latest.items()
+        ], ordered=False)
+        # Como na rota individual, só conta o que virou like
+        liked = [eid for eid, reaction in latest.items()
+                 if reaction == "like" and (user_str, eid) not in ja_curtidos]
+        await trending.record_activity_many(liked, "likes")
+        await gamificacao_service.conceder_xp_lote(user_id, "like", liked)
+
+    return results
+
+
+def trending_filter(tag: str | None, city: str | None) -> dict:
+    query = {}
+    if tag:
+        query["tags"] = tag
+    if city:
+        query["city"] = city
+    return query
+
+
+def trending_to_out(doc: dict) -> dict:
+    return {
+        "id": str(doc["_id"]),
+        "name": doc.get("name"),
+        "likes": doc.get("likes", 0),
+        "tags": doc.get("tags", []),
+        "image": doc.get("image"),
+        "start_date": doc.get("start_date"),
+        "address": doc.get("address")
+    }
+
+
 @router.get("/stats/top-liked")
-async def listar_top_eventos(limit: int = 10):
+async def listar_top_eventos(limit: int = 10, tag: str | None = None, city: str | None = None):
     """
-    Retorna os eventos mais curtidos com base na contagem de 'likes'
+    Retorna os eventos mais curtidos com base na contagem de 'likes'.
+    Lê da coleção materializada `trending_events` (atualizada periodicamente).
     """
-    pipeline = [
-        {"$match": {"reaction": "like"}},
-        {"$group": {
-            "_id": "$event_id",
-            "likes": {"$sum": 1}
-        }},
-        {"$sort": {"likes": -1}},
-        {"$limit": limit}
-    ]
-
-    results = db.event_reactions.aggregate(pipeline)
-    top_events = []
-
-    async for r in results:
-        event = await db.events.find_one({"_id": r["_id"]})
-        if event:
-            top_events.append({
-                "id": str(event["_id"]),
-                "name": event.get("name"),
-                "likes": r["likes"],
-                "tags": event.get("tags", []),
-                "image": event.get("image"),
-                "start_date": event.get("start_date"),
-                "address": event.get("address")
-            })
+    query = {**trending_filter(tag, city), "likes": {"$gt": 0}}
+    cursor = db.trending_events.find(query).sort("likes", -1).limit(limit)
+    top_events = [trending_to_out(doc) async for doc in cursor]
 
     return {"top_liked_events": top_events}
 
 
+@router.get("/stats/trending")
+async def listar_eventos_em_alta(limit: int = 10, tag: str | None = None, city: str | None = None):
+    """
+    Retorna os eventos em alta: likes, participações e votos de tags recentes,
+    com decaimento exponencial pelo tempo.
+    """
+    query = {**trending_filter(tag, city), "score": {"$gt": 0}}
+    cursor = db.trending_events.find(query).sort("score", -1).limit(limit)
+
+    trending_events = []
+    async for doc in cursor:
+        trending_events.append({
+            **trending_to_out(doc),
+            "score": doc.get("score", 0.0),
+            "recent": doc.get("recent", {})
+        })
+
+    return {"trending_events": trending_events}
+
+
+@router.post("/stats/trending/atualizar")
+async def atualizar_trending(current_user=Depends(get_current_user)):
+    """Força a atualização da coleção de trending (admin)."""
+    if current_user.get("role") != "admin":
+        raise HTTPException(
+            status_code=403, detail="Somente administradores podem atualizar o trending")
+    updated = await trending.refresh_trending()
+    return {"message": f"{updated} eventos atualizados no trending"}
+
+
+@router.get("/stats/reacoes-buffer")
+async def metricas_buffer_reacoes(current_user=Depends(get_current_user)):
+    """
+    Métricas do modo write-behind: taxa de agrupamento e latência dos flushes.
+    """
+    if current_user.get("role") != "admin":
+        raise HTTPException(
+            status_code=403, detail="Somente administradores podem ver as métricas")
+    return reaction_buffer.metrics()
+
+
 @router.get("/likes/me")
 async def listar_eventos_curtidos(current_user=Depends(get_current_user)):
     """
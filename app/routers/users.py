@@ -1,14 +1,23 @@
-from app.routers.categories import DEFAULT_TAGS
-from fastapi import APIRouter, Depends, HTTPException, status
-from app.models.usuario import UserCreate, UserOut
+from app.services.tag_registry import tag_registry
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
+from app.models.usuario import UserCreate, UserOut, FriendImport
 from app.database import db
 from app.auth import get_password_hash, verify_password, create_access_token, get_current_user, ACCESS_TOKEN_EXPIRE_MINUTES
 from fastapi.security import OAuth2PasswordRequestForm
 from bson.objectid import ObjectId
+from pymongo import UpdateOne
+from app.services import amigos_eventos, feed
+from app.services.sugestoes_amigos import social_graph, sugerir_amigos
+from app.services.gamificacao import gamificacao_service
+from app.services.leaderboard import leaderboard
 from datetime import datetime, timedelta
+import asyncio
 
 router = APIRouter()
 
+# Limite de contatos aceitos por chamada em /amigos/importar
+MAX_FRIEND_IMPORT = 500
+
 
 def user_to_out(user_doc: dict) -> dict:
     return {
@@ -46,6 +55,7 @@ async def create_user(user: UserCreate):
         "created_at": datetime.utcnow()
     }
     res = await db.users.insert_one(doc)
+    await leaderboard.publicar_xp(None, 0)
     created = await db.users.find_one({"_id": res.inserted_id})
     return user_to_out(created)
 
@@ -110,6 +120,27 @@ async def get_friends(current_user=Depends(get_current_user)):
     }
 
 
+@router.get("/me/sugestoes-amigos")
+async def sugestoes_amigos(limit: int = 10, current_user=Depends(get_current_user)):
+    """
+    Sugere amigos pelo número de amigos em comum e de eventos em comum.
+    """
+    limit = max(1, min(limit, 50))
+    sugestoes = await sugerir_amigos(str(current_user["_id"]), limit)
+    return {"sugestoes": sugestoes, "count": len(sugestoes)}
+
+
+@router.get("/me/feed")
+async def obter_feed(limit: int = 20, offset: int = 0, current_user=Depends(get_current_user)):
+    """
+    Feed de atividades dos amigos (curtidas, inscrições e novas amizades).
+    """
+    limit = max(1, min(limit, 50))
+    offset = max(0, offset)
+    items = await feed.ler_feed(current_user, limit, offset)
+    return {"items": items, "count": len(items), "offset": offset}
+
+
 @router.get("/{id}", response_model=UserOut)
 async def get_user(id: str, current_user=Depends(get_current_user)):
     user = await db.users.find_one({"_id": ObjectId(id)})
@@ -118,8 +149,85 @@ async def get_user(id: str, current_user=Depends(get_current_user)):
     return user_to_out(user)
 
 
+async def criar_amizades(user: dict, friends: list[dict]):
+    """
+    Cria as arestas de amizade em lote: um `bulk_write` em `users` (os dois
+    lados de cada aresta) e outro em `friendships`, executados em paralelo.
+    """
+    user_id_str = str(user["_id"])
+    friend_ids = [str(f["_id"]) for f in friends]
+    now = datetime.utcnow()
+
+    user_ops = [UpdateOne({"_id": f["_id"]}, {"$addToSet": {"friends": user_id_str}})
+                for f in friends]
+    user_ops.append(UpdateOne({"_id": user["_id"]}, {
+                    "$addToSet": {"friends": {"$each": friend_ids}}}))
+
+    # registro de auditoria; upsert deixa a operação idempotente
+    friendship_ops = [UpdateOne(
+        {"user_id": user_id_str, "friend_id": friend_id},
+        {"$setOnInsert": {"status": "accepted", "created_at": now}},
+        upsert=True
+    ) for friend_id in friend_ids]
+
+    await asyncio.gather(
+        db.users.bulk_write(user_ops, ordered=False),
+        db.friendships.bulk_write(friendship_ops, ordered=False),
+    )
+
+    amigos_eventos.invalidar(user_id_str)
+    for friend_id in friend_ids:
+        amigos_eventos.invalidar(friend_id)
+        social_graph.add_edge(user_id_str, friend_id)
+
+    # XP para os dois lados de cada nova amizade
+    await asyncio.gather(
+        gamificacao_service.conceder_xp_lote(user["_id"], "amizade", friend_ids),
+        *[gamificacao_service.conceder_xp(f["_id"], "amizade", user_id_str) for f in friends]
+    )
+
+
+@router.post("/amigos/importar")
+async def importar_amigos(contatos: FriendImport, background_tasks: BackgroundTasks, current_user=Depends(get_current_user)):
+    """
+    Adiciona vários amigos de uma vez (ex.: sincronização de contatos).
+    Resolve todos os emails/ids com um único `$in`.
+    """
+    if len(contatos.emails) + len(contatos.ids) > MAX_FRIEND_IMPORT:
+        raise HTTPException(
+            status_code=400, detail=f"Envie no máximo {MAX_FRIEND_IMPORT} contatos")
+
+    user_id = str(current_user["_id"])
+    already = set(current_user.get("friends", []))
+    object_ids = [ObjectId(i) for i in contatos.ids if ObjectId.is_valid(i)]
+
+    found = [f async for f in db.users.find(
+        {"$or": [{"_id": {"$in": object_ids}},
+                 {"email": {"$in": contatos.emails}}]},
+        {"name": 1, "email": 1, "friends": 1}
+    )]
+
+    new_friends = [f for f in found
+                   if str(f["_id"]) != user_id and str(f["_id"]) not in already]
+    if new_friends:
+        await criar_amizades(current_user, new_friends)
+        # Mesmos itens de feed do add_friend, um par por amizade criada
+        for friend in new_friends:
+            background_tasks.add_task(
+                feed.publicar, current_user, "amizade", friend=friend)
+            background_tasks.add_task(
+                feed.publicar, friend, "amizade", friend=current_user)
+
+    found_keys = {str(f["_id"]) for f in found} | {f["email"] for f in found}
+    return {
+        "added": [str(f["_id"]) for f in new_friends],
+        "already_friends": [str(f["_id"]) for f in found if str(f["_id"]) in already],
+        "not_found": [c for c in [*contatos.emails, *contatos.ids] if c not in found_keys]
+    }
+
+
 @router.post("/amigos/{idAmigo}")
-async def add_friend(idAmigo: str, current_user=Depends(get_current_user)):
+async def add_friend(idAmigo: str, background_tasks: BackgroundTasks, current_user=Depends(get_current_user)):
     # get the current user's ID from the authenticated user
     user_id = str(current_user["_id"])
     
@@ -127,27 +235,19 @@ async def add_friend(idAmigo: str, current_user=Depends(get_current_user)):
         raise HTTPException(
             status_code=400, detail="Cannot add yourself as friend")
 
-    user = await db.users.find_one({"_id": ObjectId(user_id)})
-    friend = await db.users.find_one({"_id": ObjectId(idAmigo)})
-    if not user or not friend:
-        raise HTTPException(status_code=404, detail="User or friend not found")
-
-    friend_id_str = str(friend["_id"])
-    user_id_str = str(user["_id"])
-
-    if friend_id_str in user.get("friends", []):
+    # current_user já é o documento do usuário; não precisa buscar de novo
+    if idAmigo in current_user.get("friends", []):
         return {"message": "Already friends"}
 
-    await db.users.update_one({"_id": ObjectId(user_id)}, {"$addToSet": {"friends": friend_id_str}})
-    await db.users.update_one({"_id": ObjectId(idAmigo)}, {"$addToSet": {"friends": user_id_str}})
+    friend = await db.users.find_one({"_id": ObjectId(idAmigo)}, {"name": 1, "friends": 1})
+    if not friend:
+        raise HTTPException(status_code=404, detail="User or friend not found")
 
-    # optional: create a friendship document for audit
-    await db.friendships.insert_one({
-        "user_id": user_id_str,
-        "friend_id": friend_id_str,
-        "status": "accepted",
-        "created_at": datetime.utcnow()
-    })
+    await criar_amizades(current_user, [friend])
+    background_tasks.add_task(
+        feed.publicar, current_user, "amizade", friend=friend)
+    background_tasks.add_task(
+        feed.publicar, friend, "amizade", friend=current_user)
 
     return {"message": "Friend added"}
 
@@ -161,9 +261,9 @@ async def definir_tags_usuario(tags: list[str], current_user=Depends(get_current
     if not (1 <= len(tags) <= 5):
         raise HTTPException(status_code=400, detail="Informe entre 1 e 5 tags")
 
-    for tag in tags:
-        if tag not in DEFAULT_TAGS:
-            raise HTTPException(status_code=400, detail=f"Tag inválida: {tag}")
+    invalidas = await tag_registry.invalidas(tags)
+    if invalidas:
+        raise HTTPException(status_code=400, detail=f"Tag inválida: {invalidas[0]}")
 
     await db.users.update_one(
         {"_id": ObjectId(current_user["_id"])},
@@ -0,0 +1,48 @@
+from datetime import datetime
+from pymongo import ReturnDocument
+from app.database import db
+
+# Entradas mais antigas que isso expiram; quem ficou tão atrás reconstrói tudo
+RETENCAO_HORAS = 24
+
+
+def documento(log_id: str, version: int, dados: dict) -> dict:
+    return {"_id": f"{log_id}:{version}", "log": log_id, "version": version,
+            "dados": dados, "created_at": datetime.utcnow()}
+
+
+async def registrar(log_id: str, dados: dict) -> int:
+    """
+    Incrementa a versão `log_id` em `registry_versions` e grava o que mudou
+    nela em `change_log`, para os outros workers aplicarem só a diferença.
+    """
+    doc = await db.registry_versions.find_one_and_update(
+        {"_id": log_id}, {"$inc": {"version": 1}},
+        upsert=True, return_document=ReturnDocument.AFTER)
+    await db.change_log.insert_one(documento(log_id, doc["version"], dados))
+    return doc["version"]
+
+
+async def versao(log_id: str) -> int:
+    doc = await db.registry_versions.find_one({"_id": log_id}, {"version": 1})
+    return doc["version"] if doc else 0
+
+
+async def ler(log_id: str, desde: int, ate: int) -> list[dict]:
+    """
+    Entradas de `desde + 1` até `ate`, em ordem. Para na primeira que falta
+    (ainda sendo gravada, ou expirada): só o trecho contíguo é devolvido.
+    """
+    entradas = []
+    async for entrada in db.change_log.find(
+        {"log": log_id, "version": {"$gt": desde, "$lte": ate}}
+    ).sort("version", 1):
+        if entrada["version"] != desde + len(entradas) + 1:
+            break
+        entradas.append(entrada)
+    return entradas
+
+
+async def ensure_indexes():
+    await db.change_log.create_index([("log", 1), ("version", 1)])
+    await db.change_log.create_index("created_at", expireAfterSeconds=RETENCAO_HORAS * 3600)
@@ -0,0 +1,82 @@
+import os
+import time
+from bson import ObjectId
+from app.database import db
+
+CACHE_TTL = float(os.environ.get("FRIENDS_GOING_CACHE_TTL", 60))
+MAX_CACHED_USERS = 10000
+MAX_NAMES = 3
+
+# user_id -> {"friends": tuple, "expires": float, "events": {event_id: anotação}}
+_cache: dict[str, dict] = {}
+
+
+def _empty() -> dict:
+    return {"count": 0, "names": []}
+
+
+async def _consultar(friend_ids: list[ObjectId], event_ids: list[ObjectId]) -> dict[str, dict]:
+    """Uma agregação sobre `event_participants` para todos os eventos da página."""
+    pipeline = [
+        {"$match": {
+            "event_id": {"$in": event_ids},
+            "user_id": {"$in": friend_ids},
+            "status": "confirmed"
+        }},
+        {"$group": {"_id": "$event_id", "count": {"$sum": 1},
+                    "user_ids": {"$push": "$user_id"}}},
+        {"$project": {"count": 1, "user_ids": {"$slice": ["$user_ids", MAX_NAMES]}}},
+        {"$lookup": {"from": "users", "localField": "user_ids", "foreignField": "_id",
+                     "pipeline": [{"$project": {"name": 1}}], "as": "friends"}},
+    ]
+    result = {}
+    async for doc in db.event_participants.aggregate(pipeline):
+        result[str(doc["_id"])] = {
+            "count": doc["count"],
+            "names": [f.get("name") for f in doc["friends"]]
+        }
+    return result
+
+
+async def anotar_amigos(current_user: dict, events: list[dict]) -> list[dict]:
+    """
+    Adiciona `friends_going` ({count, names}) a cada evento da lista.
+    O resultado fica em cache por usuário durante CACHE_TTL segundos; só os
+    eventos ainda não vistos na janela são consultados no banco.
+    """
+    friends = tuple(current_user.get("friends", []))
+    if not friends:
+        for ev in events:
+            ev["friends_going"] = _empty()
+        return events
+
+    user_id = str(current_user["_id"])
+    now = time.monotonic()
+    entry = _cache.get(user_id)
+    if entry is None or entry["expires"] < now or entry["friends"] != friends:
+        if len(_cache) >= MAX_CACHED_USERS:
+            _remover_expirados(now)
+        entry = {"friends": friends, "expires": now + CACHE_TTL, "events": {}}
+        _cache[user_id] = entry
+
+    missing = [ev["id"] for ev in events if ev["id"] not in entry["events"]]
+    if missing:
+        found = await _consultar(
+            [ObjectId(f) for f in friends], [ObjectId(e) for e in missing])
+        for event_id in missing:
+            entry["events"][event_id] = found.get(event_id, _empty())
+
+    for ev in events:
+        ev["friends_going"] = entry["events"][ev["id"]]
+    return events
+
+
+def _remover_expirados(now: float):
+    for key in [k for k, v in _cache.items() if v["expires"] < now]:
+        del _cache[key]
+    if len(_cache) >= MAX_CACHED_USERS:
+        _cache.clear()
+
+
+def invalidar(user_id: str):
+    _cache.pop(user_id, None)
@@ -0,0 +1,101 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from pymongo import ReplaceOne, UpdateOne
+from app.database import db
+from app.services import catalogo
+from app.services.reaction_buffer import reaction_buffer
+
+# Eventos encerrados há mais que isso saem da coleção `events`
+GRACE_HOURS = float(os.environ.get("ARCHIVE_GRACE_HOURS", 24))
+INTERVAL_SECONDS = float(os.environ.get("ARCHIVE_INTERVAL_SECONDS", 3600))
+BATCH_SIZE = int(os.environ.get("ARCHIVE_BATCH_SIZE", 500))
+
+logger = logging.getLogger(__name__)
+
+
+def filtro_futuros() -> dict:
+    """Filtro (indexado) de eventos que ainda não terminaram."""
+    return {"end_date": {"$gte": datetime.utcnow()}}
+
+
+async def arquivar_eventos_encerrados() -> int:
+    """
+    Move eventos encerrados para `events_archive`, em lotes.
+
+    Reações e inscrições continuam em `event_reactions`/`event_participants`
+    (a filtragem colaborativa usa esse histórico). A cópia é um upsert pelo
+    `_id`, então uma execução interrompida entre cópia e remoção é refeita
+    sem duplicar.
+    """
+    limite = datetime.utcnow() - timedelta(hours=GRACE_HOURS)
+    total = 0
+    while True:
+        docs = [ev async for ev in db.events.find(
+            {"end_date": {"$lt": limite}}).limit(BATCH_SIZE)]
+        if not docs:
+            return total
+
+        now = datetime.utcnow()
+        await db.events_archive.bulk_write(
+            [ReplaceOne({"_id": ev["_id"]}, {**ev, "archived_at": now}, upsert=True)
+             for ev in docs],
+            ordered=False
+        )
+        ids = [ev["_id"] for ev in docs]
+        await db.events.delete_many({"_id": {"$in": ids}})
+
+        removidos = [str(_id) for _id in ids]
+        for event_id in removidos:
+            reaction_buffer.forget_event(event_id)
+        await catalogo.registrar_escrita(removidos=removidos)
+        total += len(docs)
+
+
+async def run_archive_loop():
+    while True:
+        try:
+            arquivados = await arquivar_eventos_encerrados()
+            if arquivados:
+                logger.info("%d eventos arquivados", arquivados)
+        except Exception:
+            logger.exception("Erro ao arquivar eventos")
+        await asyncio.sleep(INTERVAL_SECONDS)
+
+
+async def migrar_datas_texto() -> int:
+    """
+    Importações antigas da Sympla gravavam `start_date`/`end_date` como texto
+    ("AAAA-MM-DD HH:MM:SS"), que o filtro `end_date >= agora` e o arquivamento
+    não enxergam. Converte esses campos em datas; textos inválidos ficam como estão.
+    """
+    convertidos = 0
+    ops = []
+    async for ev in db.events.find(
+        {"$or": [{"start_date": {"$type": "string"}}, {"end_date": {"$type": "string"}}]},
+        {"start_date": 1, "end_date": 1}
+    ):
+        update = {}
+        for campo in ("start_date", "end_date"):
+            if isinstance(ev.get(campo), str):
+                try:
+                    update[campo] = datetime.fromisoformat(ev[campo])
+                except ValueError:
+                    continue
+        if update:
+            ops.append(UpdateOne({"_id": ev["_id"]}, {"$set": update}))
+        if len(ops) >= BATCH_SIZE:
+            convertidos += (await db.events.bulk_write(ops, ordered=False)).modified_count
+            ops = []
+    if ops:
+        convertidos += (await db.events.bulk_write(ops, ordered=False)).modified_count
+    return convertidos
+
+
+async def ensure_indexes():
+    # Migração única (no-op depois da primeira execução), como a de `location`
+    if await migrar_datas_texto():
+        # As datas entram no índice de busca: os outros workers reconstroem
+        await catalogo.marcar_alteracao(reconstruir=True)
+    await db.events_archive.create_index([("end_date", -1)])
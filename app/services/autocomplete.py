@@ -0,0 +1,214 @@
+import re
+import unicodedata
+from bisect import bisect_left, insort
+from app.database import db
+from app.services.catalogo import IndiceCatalogo, registrar_indice
+
+MIN_PREFIX = 2
+MAX_SUGESTOES = 20
+# Prefixos até esse tamanho têm os candidatos pré-ordenados por popularidade
+PREFIXO_ORDENADO = 3
+# Faixas menores que isso são ordenadas direto; maiores usam a lista pré-ordenada
+FAIXA_PEQUENA = 512
+# Passos pela lista pré-ordenada antes de montar os filtros dos outros tokens
+PASSOS_SEM_FILTRO = 256
+
+
+def dobrar(texto: str) -> str:
+    """Minúsculas e sem acentos: "Aquático" -> "aquatico"."""
+    decomposed = unicodedata.normalize("NFKD", texto or "")
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def tokens(texto: str) -> list[str]:
+    return [t for t in re.split(r"[^0-9a-z]+", dobrar(texto)) if t]
+
+
+class IndiceAutocomplete(IndiceCatalogo):
+    """
+    Autocomplete por prefixo sobre nomes de eventos e de locais (`address.name`).
+
+    Cada token dobrado (sem acento) de cada sugestão entra em uma lista
+    ordenada; o prefixo digitado vira um intervalo achado com `bisect`.
+    Sugestões removidas ficam marcadas como inativas até a reconstrução.
+
+    Para cada prefixo curto (até PREFIXO_ORDENADO letras) os candidatos
+    ficam ordenados por popularidade; a consulta percorre essa lista e para
+    nas `limit` primeiras sugestões que combinam, em vez de ordenar todos
+    os candidatos de um prefixo comum ("te", "parque").
+    """
+
+    PROJECAO = {"name": 1, "address.name": 1, "participant_counts": 1}
+
+    def __init__(self):
+        super().__init__()
+        self._reiniciar()
+        self.likes: dict = {}
+
+    def _reiniciar(self):
+        # Lista ordenada de (token, sugestão)
+        self.keys: list[tuple[str, int]] = []
+        # Sugestões: texto exibido, tipo, event_id, popularidade, tokens, ativa
+        self.textos: list[str] = []
+        self.tipos: list[str] = []
+        self.event_ids: list[str | None] = []
+        self.popularidade: list[float] = []
+        self.tokens: list[tuple[str, ...]] = []
+        self.alive = bytearray()
+        # Na carga completa as chaves são ordenadas uma vez só, no final
+        self.ordenado = True
+        # event_id -> (sugestão do evento, sugestão do local, popularidade)
+        self.por_evento: dict[str, tuple[int, int | None, float]] = {}
+        # nome de local dobrado -> [sugestão, número de eventos]
+        self.locais: dict[str, list[int]] = {}
+        # prefixo curto -> sugestões em ordem de popularidade (montado sob demanda)
+        self.por_prefixo: dict[str, list[int]] = {}
+
+    async def _preparar(self):
+        # Likes vêm do ranking materializado, sem agregar as reações de novo
+        self.likes = {str(t["_id"]): t.get("likes", 0)
+                      async for t in db.trending_events.find({}, {"likes": 1})}
+        self.ordenado = False
+
+    def _finalizar(self):
+        self.keys.sort()
+        self.ordenado = True
+        # Pré-ordena todos os prefixos curtos antes da troca do índice
+        for tok, _ in self.keys:
+            for n in range(MIN_PREFIX, PREFIXO_ORDENADO + 1):
+                if len(tok) >= n:
+                    self._ordenados(tok[:n])
+
+    def _ordem(self, idx: int) -> tuple:
+        # Mais popular primeiro; no empate, o texto mais curto
+        return (-self.popularidade[idx], len(self.textos[idx]), idx)
+
+    def _ordenados(self, prefixo: str) -> list[int]:
+        chave = prefixo[:PREFIXO_ORDENADO]
+        lista = self.por_prefixo.get(chave)
+        if lista is None:
+            lo, hi = self._intervalo(chave)
+            lista = sorted({self.keys[i][1] for i in range(lo, hi)}, key=self._ordem)
+            self.por_prefixo[chave] = lista
+        return lista
+
+    def _invalidar(self, idx: int):
+        """A sugestão entrou ou mudou de popularidade: as listas dos prefixos dela são refeitas."""
+        if not self.por_prefixo:
+            return
+        for tok in self.tokens[idx]:
+            for n in range(MIN_PREFIX, PREFIXO_ORDENADO + 1):
+                self.por_prefixo.pop(tok[:n], None)
+
+    def _nova_sugestao(self, texto: str, tipo: str, event_id: str | None, popularidade: float) -> int:
+        idx = len(self.textos)
+        toks = tuple(tokens(texto))
+        self.textos.append(texto)
+        self.tipos.append(tipo)
+        self.event_ids.append(event_id)
+        self.popularidade.append(popularidade)
+        self.tokens.append(toks)
+        self.alive.append(1)
+        for tok in set(toks):
+            if self.ordenado:
+                insort(self.keys, (tok, idx))
+            else:
+                self.keys.append((tok, idx))
+        self._invalidar(idx)
+        return idx
+
+    def adicionar(self, doc: dict):
+        event_id = str(doc["_id"])
+        self.remover(event_id)
+        name = doc.get("name")
+        if not name:
+            return
+
+        counts = doc.get("participant_counts") or {}
+        popularidade = counts.get("confirmed", 0) + self.likes.get(event_id, 0)
+        evento = self._nova_sugestao(name, "evento", event_id, popularidade)
+
+        local = None
+        venue = (doc.get("address") or {}).get("name")
+        if venue:
+            chave = dobrar(venue)
+            entry = self.locais.get(chave)
+            if entry is None or not self.alive[entry[0]]:
+                entry = self.locais[chave] = [self._nova_sugestao(venue, "local", None, 0.0), 0]
+            local = entry[0]
+            entry[1] += 1
+            # Local popular = soma da popularidade dos eventos dele
+            self.popularidade[local] += popularidade + 1
+            self._invalidar(local)
+        self.por_evento[event_id] = (evento, local, popularidade)
+
+    def remover(self, event_id: str):
+        entry = self.por_evento.pop(event_id, None)
+        if entry is None:
+            return
+        evento, local, popularidade = entry
+        self.alive[evento] = 0
+        if local is not None:
+            chave = dobrar(self.textos[local])
+            self.popularidade[local] -= popularidade + 1
+            self._invalidar(local)
+            self.locais[chave][1] -= 1
+            if self.locais[chave][1] <= 0:
+                self.alive[local] = 0
+                del self.locais[chave]
+
+    def _intervalo(self, prefixo: str) -> tuple[int, int]:
+        lo = bisect_left(self.keys, (prefixo,))
+        hi = bisect_left(self.keys, (prefixo + "\uffff",))
+        return lo, hi
+
+    def _percorrer(self, base: str, query: list[str], combina, limit: int) -> list[int]:
+        """Percorre os candidatos de `base` em ordem de popularidade até achar `limit`."""
+        top = []
+        filtros = None
+        lista = self._ordenados(base)
+        for passo, idx in enumerate(lista):
+            if passo == PASSOS_SEM_FILTRO and len(query) > 1:
+                # Combinação rara de termos comuns: as listas dos prefixos dos
+                # outros tokens (um superconjunto) cortam os candidatos antes
+                filtros = set(lista).intersection(
+                    *[self._ordenados(t) for t in query if t != base and len(t) >= MIN_PREFIX])
+            if filtros is not None and idx not in filtros:
+                continue
+            if combina(idx):
+                top.append(idx)
+                if len(top) >= limit:
+                    break
+        return top
+
+    def sugerir(self, texto: str, limit: int = 8) -> list[dict]:
+        query = tokens(texto)
+        if not query or len("".join(query)) < MIN_PREFIX:
+            return []
+
+        # Parte do token com menos candidatos; os demais filtram
+        intervalos = [self._intervalo(t) for t in query]
+        lo, hi = min(intervalos, key=lambda r: r[1] - r[0])
+        base = query[intervalos.index((lo, hi))]
+        if hi - lo == 0 or (hi - lo > FAIXA_PEQUENA and len(base) < MIN_PREFIX):
+            # Só letras soltas ("a b"): curto demais para sugerir
+            return []
+
+        def combina(idx: int) -> bool:
+            if not self.alive[idx]:
+                return False
+            toks = self.tokens[idx]
+            return all(any(t.startswith(q) for t in toks) for q in query)
+
+        if hi - lo <= FAIXA_PEQUENA:
+            # Prefixo raro: ordenar só a faixa exata sai mais barato
+            candidatos = {self.keys[i][1] for i in range(lo, hi)}
+            top = sorted(filter(combina, candidatos), key=self._ordem)[:limit]
+        else:
+            top = self._percorrer(base, query, combina, limit)
+        return [{"texto": self.textos[idx], "tipo": self.tipos[idx],
+                 "event_id": self.event_ids[idx]} for idx in top]
+
+
+indice_autocomplete = IndiceAutocomplete()
+registrar_indice(indice_autocomplete)
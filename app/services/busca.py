@@ -0,0 +1,210 @@
+import math
+from array import array
+from collections import Counter
+from datetime import datetime, timezone
+import numpy as np
+from app.services.catalogo import IndiceCatalogo, registrar_indice
+from app.services.texto import clean_text
+
+# Parâmetros do BM25
+K1 = 1.2
+B = 0.75
+# O nome pesa mais que o restante do texto
+PESO_NOME = 2
+# Compacta quando os slots inativos passam dessa fração (e do mínimo)
+COMPACTAR_FRACAO = 0.25
+COMPACTAR_MINIMO = 1000
+
+
+def _timestamp(value) -> float:
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return math.nan
+    if isinstance(value, datetime):
+        # Datas sem fuso no banco estão em UTC
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    return math.nan
+
+
+def tokens_evento(doc: dict) -> Counter:
+    """Frequência dos termos do evento (nome, tags, categorias e detalhe)."""
+    tf = Counter()
+    for _ in range(PESO_NOME):
+        tf.update(clean_text(doc.get("name") or "").split())
+    partes = list(doc.get("tags") or [])
+    for campo in ("category_prim", "category_sec"):
+        if isinstance(doc.get(campo), dict):
+            partes.append(doc[campo].get("name") or "")
+    partes.append(doc.get("detail") or "")
+    tf.update(clean_text(" ".join(partes)).split())
+    return tf
+
+
+class IndiceBusca(IndiceCatalogo):
+    """
+    Índice invertido BM25 dos eventos.
+
+    Cada evento ocupa uma posição (slot) em arrays paralelos; as listas de
+    postings guardam slots e frequências em `array` e são pontuadas com
+    numpy. Remoções só marcam o slot como inativo; quando os inativos
+    passam de COMPACTAR_FRACAO o índice é compactado no próprio worker.
+    """
+
+    PROJECAO = {"name": 1, "tags": 1, "category_prim": 1,
+                "category_sec": 1, "detail": 1, "start_date": 1}
+
+    def __init__(self):
+        super().__init__()
+        self._reiniciar()
+
+    def _reiniciar(self):
+        self.ids: list[str] = []
+        self.slot_of: dict[str, int] = {}
+        self.alive = bytearray()
+        self.lengths = array("I")
+        self.starts = array("d")
+        self.tags: list[tuple] = []
+        # Termos de cada slot, para a remoção não percorrer o vocabulário
+        self.termos: list[tuple[str, ...]] = []
+        # termo -> (slots, frequências)
+        self.postings: dict[str, tuple[array, array]] = {}
+        self.df: Counter = Counter()
+        self.total = 0
+        self.total_length = 0
+        self.mortos = 0
+
+    def adicionar(self, doc: dict):
+        event_id = str(doc["_id"])
+        self.remover(event_id)
+
+        tf = tokens_evento(doc)
+        slot = len(self.ids)
+        self.ids.append(event_id)
+        self.slot_of[event_id] = slot
+        self.alive.append(1)
+        length = sum(tf.values())
+        self.lengths.append(length)
+        self.starts.append(_timestamp(doc.get("start_date")))
+        self.tags.append(tuple(doc.get("tags") or ()))
+        self.termos.append(tuple(tf))
+
+        for term, freq in tf.items():
+            posting = self.postings.get(term)
+            if posting is None:
+                posting = self.postings[term] = (array("I"), array("H"))
+            posting[0].append(slot)
+            posting[1].append(min(freq, 65535))
+            self.df[term] += 1
+        self.total += 1
+        self.total_length += length
+
+    def remover(self, event_id: str):
+        self.remover_varios((event_id,))
+
+    def remover_varios(self, event_ids):
+        removidos = Counter()
+        for event_id in event_ids:
+            slot = self.slot_of.pop(event_id, None)
+            if slot is None:
+                continue
+            self.alive[slot] = 0
+            self.total -= 1
+            self.total_length -= self.lengths[slot]
+            removidos.update(self.termos[slot])
+            self.termos[slot] = ()
+            self.mortos += 1
+        # df conta só documentos ativos; os postings antigos ficam até a compactação
+        self.df.subtract(removidos)
+        # Um lote inteiro compacta no máximo uma vez
+        if self.mortos > COMPACTAR_MINIMO and self.mortos > len(self.ids) * COMPACTAR_FRACAO:
+            self._compactar()
+
+    def _compactar(self):
+        """Descarta os slots inativos e renumera os postings."""
+        vivos = np.flatnonzero(np.frombuffer(self.alive, dtype=np.uint8))
+        novo_slot = np.full(len(self.ids), -1, dtype=np.int64)
+        novo_slot[vivos] = np.arange(len(vivos))
+
+        postings = {}
+        for term, (slots, freqs) in self.postings.items():
+            s = np.frombuffer(slots, dtype=np.uint32)
+            f = np.frombuffer(freqs, dtype=np.uint16)
+            mapeados = novo_slot[s]
+            manter = mapeados >= 0
+            if not manter.any():
+                continue
+            novos_slots, novas_freqs = array("I"), array("H")
+            novos_slots.frombytes(mapeados[manter].astype(np.uint32).tobytes())
+            novas_freqs.frombytes(f[manter].tobytes())
+            postings[term] = (novos_slots, novas_freqs)
+
+        vivos = vivos.tolist()
+        self.ids = [self.ids[i] for i in vivos]
+        self.slot_of = {event_id: slot for slot, event_id in enumerate(self.ids)}
+        self.alive = bytearray(b"\x01") * len(vivos)
+        self.lengths = array("I", [self.lengths[i] for i in vivos])
+        self.starts = array("d", [self.starts[i] for i in vivos])
+        self.tags = [self.tags[i] for i in vivos]
+        self.termos = [self.termos[i] for i in vivos]
+        self.postings = postings
+        self.df = Counter({term: n for term, n in self.df.items() if n > 0})
+        self.mortos = 0
+
+    def buscar(self, query: str, limit: int = 20, tag: str | None = None,
+               data_inicio: datetime | None = None,
+               data_fim: datetime | None = None) -> list[tuple[str, float]]:
+        """Retorna [(event_id, score)] em ordem decrescente de relevância."""
+        terms = set(clean_text(query).split())
+        if not terms or not self.total or limit <= 0:
+            return []
+
+        avgdl = self.total_length / self.total or 1.0
+        lengths = np.frombuffer(self.lengths, dtype=np.uint32)
+        scores = np.zeros(len(self.ids))
+
+        for term in terms:
+            posting = self.postings.get(term)
+            df = self.df.get(term, 0)
+            if posting is None or df <= 0:
+                continue
+            idf = math.log(1 + (self.total - df + 0.5) / (df + 0.5))
+            slots = np.frombuffer(posting[0], dtype=np.uint32)
+            freqs = np.frombuffer(posting[1], dtype=np.uint16).astype(np.float64)
+            norm = K1 * (1 - B + B * lengths[slots] / avgdl)
+            # Um termo aparece uma vez por slot, então a soma indexada é segura
+            scores[slots] += idf * freqs * (K1 + 1) / (freqs + norm)
+
+        candidatos = np.flatnonzero(scores)
+        candidatos = candidatos[np.frombuffer(self.alive, dtype=np.uint8)[candidatos] == 1]
+        if data_inicio is not None or data_fim is not None:
+            starts = np.frombuffer(self.starts, dtype=np.float64)[candidatos]
+            # NaN (evento sem data) não passa em nenhuma comparação
+            manter = np.ones(len(candidatos), dtype=bool)
+            if data_inicio is not None:
+                manter &= starts >= _timestamp(data_inicio)
+            if data_fim is not None:
+                manter &= starts <= _timestamp(data_fim)
+            candidatos = candidatos[manter]
+
+        if not tag and len(candidatos) > limit:
+            # Só os `limit` melhores precisam ser ordenados
+            candidatos = candidatos[np.argpartition(-scores[candidatos], limit - 1)[:limit]]
+            candidatos.sort()
+        ordem = candidatos[np.argsort(-scores[candidatos], kind="stable")]
+
+        top = []
+        for slot in ordem.tolist():
+            if tag and tag not in self.tags[slot]:
+                continue
+            top.append((self.ids[slot], float(scores[slot])))
+            if len(top) >= limit:
+                break
+        return top
+
+
+indice_busca = IndiceBusca()
+registrar_indice(indice_busca)
@@ -0,0 +1,145 @@
+import asyncio
+import os
+import uuid
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+from app.database import db
+
+# Coleções que referenciam `events` pelo campo `event_id`
+DEPENDENTES = ("event_reactions", "event_participants",
+               "event_tag_votes", "event_activity_buckets")
+BATCH_SIZE = 1000
+
+
+async def _apagar_em_lotes(collection, filtro: dict) -> int:
+    """`delete_many` em lotes de BATCH_SIZE, para não segurar o banco em uma operação longa."""
+    total = 0
+    while True:
+        ids = [doc["_id"] async for doc in collection.find(filtro, {"_id": 1}).limit(BATCH_SIZE)]
+        if not ids:
+            return total
+        total += (await collection.delete_many({"_id": {"$in": ids}})).deleted_count
+
+
+async def _descontar_participacoes(event_ids: list[ObjectId]):
+    """Tira dos usuários as inscrições que serão apagadas (`participation_counts`)."""
+    ops = []
+    async for doc in db.event_participants.aggregate([
+        {"$match": {"event_id": {"$in": event_ids}}},
+        {"$group": {"_id": {"user_id": "$user_id", "status": "$status"}, "count": {"$sum": 1}}},
+    ]):
+        ops.append(UpdateOne(
+            {"_id": doc["_id"]["user_id"]},
+            {"$inc": {f"participation_counts.{doc['_id']['status']}": -doc["count"]}}))
+    if ops:
+        await db.users.bulk_write(ops, ordered=False)
+
+
+async def remover_dependentes(event_ids: list[ObjectId]) -> dict:
+    """Apaga reações, inscrições, votos e atividade dos eventos removidos."""
+    await _descontar_participacoes(event_ids)
+    removidos = {}
+    for name in DEPENDENTES:
+        removidos[name] = await _apagar_em_lotes(db[name], {"event_id": {"$in": event_ids}})
+    return removidos
+
+
+# 🔹 Varredura de órfãos (dados gravados antes da remoção em cascata)
+
+# Uma varredura sem atualização há mais tempo que isso é considerada morta
+STALE_MINUTES = int(os.environ.get("ORPHAN_SWEEP_STALE_MINUTES", 30))
+
+_tarefas: set[asyncio.Task] = set()
+
+
+async def _existentes(event_ids: list[ObjectId]) -> set[ObjectId]:
+    # Eventos arquivados não são órfãos: o histórico deles é mantido
+    existentes = set()
+    for collection in (db.events, db.events_archive):
+        existentes.update([doc["_id"] async for doc in collection.find(
+            {"_id": {"$in": event_ids}}, {"_id": 1})])
+    return existentes
+
+
+async def _atualizar(sweep_id: str, update: dict):
+    update.setdefault("$set", {})["updated_at"] = datetime.utcnow()
+    await db.orphan_sweeps.update_one({"_id": sweep_id}, update)
+
+
+async def varrer_orfaos(sweep_id: str):
+    """Executa a varredura; o progresso fica em `orphan_sweeps`, visível a todos os workers."""
+    try:
+        for name in DEPENDENTES:
+            collection = db[name]
+            prefixo = f"colecoes.{name}"
+            event_ids = [doc["_id"] async for doc in collection.aggregate(
+                [{"$group": {"_id": "$event_id"}}], allowDiskUse=True)]
+            await _atualizar(sweep_id, {"$set": {
+                "colecao_atual": name, f"{prefixo}.eventos_total": len(event_ids)}})
+
+            for i in range(0, len(event_ids), BATCH_SIZE):
+                lote = event_ids[i:i + BATCH_SIZE]
+                existentes = await _existentes(lote)
+                orfaos = [e for e in lote if e not in existentes]
+                removidos = 0
+                if orfaos:
+                    if name == "event_participants":
+                        await _descontar_participacoes(orfaos)
+                    removidos = await _apagar_em_lotes(
+                        collection, {"event_id": {"$in": orfaos}})
+                await _atualizar(sweep_id, {"$inc": {
+                    f"{prefixo}.eventos_verificados": len(lote),
+                    f"{prefixo}.eventos_orfaos": len(orfaos),
+                    f"{prefixo}.removidos": removidos}})
+        final = {"status": "concluido"}
+    except Exception as exc:
+        final = {"status": "erro", "erro": str(exc)}
+    await _atualizar(sweep_id, {
+        "$set": {**final, "concluido_em": datetime.utcnow()},
+        "$unset": {"active": "", "colecao_atual": ""}})
+
+
+async def iniciar_varredura() -> bool:
+    """Inicia a varredura em segundo plano; False se já há uma em andamento (em qualquer worker)."""
+    # Libera a trava de uma varredura que morreu sem finalizar
+    await db.orphan_sweeps.update_many(
+        {"active": True, "updated_at": {"$lt": datetime.utcnow() - timedelta(minutes=STALE_MINUTES)}},
+        {"$set": {"status": "erro", "erro": "Varredura interrompida"}, "$unset": {"active": ""}}
+    )
+
+    sweep_id = uuid.uuid4().hex
+    now = datetime.utcnow()
+    try:
+        await db.orphan_sweeps.insert_one({
+            "_id": sweep_id,
+            "status": "executando",
+            "active": True,  # índice único parcial: só uma varredura ativa
+            "iniciado_em": now,
+            "updated_at": now,
+            "colecoes": {name: {"eventos_verificados": 0, "eventos_orfaos": 0, "removidos": 0}
+                         for name in DEPENDENTES},
+        })
+    except DuplicateKeyError:
+        return False
+
+    task = asyncio.create_task(varrer_orfaos(sweep_id))
+    _tarefas.add(task)
+    task.add_done_callback(_tarefas.discard)
+    return True
+
+
+async def progresso() -> dict:
+    """Última varredura iniciada (ou status "parado" se nunca houve uma)."""
+    doc = await db.orphan_sweeps.find_one({}, {"active": 0}, sort=[("iniciado_em", -1)])
+    if doc is None:
+        return {"status": "parado"}
+    doc.pop("_id")
+    return doc
+
+
+async def ensure_indexes():
+    await db.orphan_sweeps.create_index(
+        "active", unique=True, partialFilterExpression={"active": True})
+    await db.orphan_sweeps.create_index([("iniciado_em", -1)])
@@ -0,0 +1,163 @@
+import asyncio
+import os
+import time
+from bson import ObjectId
+from app.database import db
+from app.services import alteracoes
+
+# Versão do catálogo de eventos, incrementada a cada escrita em `events`
+VERSION_ID = "events"
+# De quanto em quanto tempo um índice em memória confere a versão
+CHECK_SECONDS = float(os.environ.get("CATALOG_CHECK_SECONDS", 5))
+# Acima desse número de eventos alterados compensa reconstruir o índice
+MAX_INCREMENTAL = int(os.environ.get("CATALOG_MAX_INCREMENTAL", 2000))
+# Uma versão que não aparece no log por mais que isso força a reconstrução
+GAP_SECONDS = 30
+
+
+def dados_alteracao(ids=(), reconstruir: bool = False) -> dict:
+    """Entrada do log de alterações do catálogo: ids alterados ou reconstrução completa."""
+    ids = list(dict.fromkeys(str(i) for i in ids))
+    if reconstruir or len(ids) > MAX_INCREMENTAL:
+        return {"ids": [], "reconstruir": True}
+    return {"ids": ids, "reconstruir": False}
+
+
+async def marcar_alteracao(ids=(), reconstruir: bool = False) -> int:
+    """
+    Registra que o catálogo mudou; caches derivados dele ficam inválidos.
+    `ids` são os eventos alterados, que os índices dos outros workers
+    recarregam; `reconstruir` pede a reconstrução completa.
+    """
+    return await alteracoes.registrar(VERSION_ID, dados_alteracao(ids, reconstruir))
+
+
+async def versao() -> int:
+    return await alteracoes.versao(VERSION_ID)
+
+
+class IndiceCatalogo:
+    """
+    Base dos índices em memória montados a partir de `events`.
+
+    As escritas feitas neste worker são aplicadas incrementalmente
+    (`registrar_escrita`). Escritas de outros workers chegam pelo log de
+    alterações: os eventos listados são relidos com um `$in` e reaplicados.
+    Só uma entrada de reconstrução (ou uma versão ausente do log) reconstrói
+    o índice, em segundo plano; o antigo continua respondendo até a troca.
+    """
+
+    PROJECAO: dict = {}
+
+    def __init__(self):
+        self.version = -1
+        self.checked_at = 0.0
+        self.gap_since: float | None = None
+        self._rebuild: asyncio.Task | None = None
+
+    # Implementados pelas subclasses
+    def _reiniciar(self):
+        raise NotImplementedError
+
+    def adicionar(self, doc: dict):
+        raise NotImplementedError
+
+    def remover(self, event_id: str):
+        raise NotImplementedError
+
+    def remover_varios(self, event_ids):
+        """Remoção em lote; subclasses com custo fixo por remoção sobrescrevem."""
+        for event_id in event_ids:
+            self.remover(event_id)
+
+    async def _preparar(self):
+        """Carrega dados auxiliares antes da reconstrução (opcional)."""
+
+    def _finalizar(self):
+        """Chamado após a carga completa, antes da troca (opcional)."""
+
+    async def construir(self):
+        version = await versao()
+        novo = type(self)()
+        await novo._preparar()
+        async for doc in db.events.find({}, self.PROJECAO):
+            novo.adicionar(doc)
+        novo._finalizar()
+        # Troca o estado de uma vez; consultas em andamento usam o antigo
+        state = dict(novo.__dict__)
+        state.update(version=version, checked_at=time.monotonic(), _rebuild=None)
+        self.__dict__.update(state)
+
+    async def ensure_current(self):
+        now = time.monotonic()
+        if now - self.checked_at < CHECK_SECONDS:
+            return
+        self.checked_at = now
+        atual = await versao()
+        if atual == self.version:
+            self.gap_since = None
+            return
+        if self.version < 0:
+            await self.construir()
+            return
+        if self._rebuild is not None and not self._rebuild.done():
+            return
+
+        entradas = await alteracoes.ler(VERSION_ID, self.version, atual)
+        ids = list(dict.fromkeys(i for e in entradas for i in e["dados"]["ids"]))
+        if any(e["dados"]["reconstruir"] for e in entradas) or len(ids) > MAX_INCREMENTAL:
+            self._reconstruir_em_segundo_plano()
+            return
+        if entradas:
+            await self._recarregar(ids)
+            self.version = max(self.version, entradas[-1]["version"])
+
+        if self.version >= atual:
+            self.gap_since = None
+        elif self.gap_since is None:
+            self.gap_since = now
+        elif now - self.gap_since > GAP_SECONDS:
+            self._reconstruir_em_segundo_plano()
+
+    def _reconstruir_em_segundo_plano(self):
+        if self._rebuild is None or self._rebuild.done():
+            self._rebuild = asyncio.create_task(self.construir())
+
+    async def _recarregar(self, ids: list[str]):
+        """Relê os eventos alterados em outro worker; os que sumiram são removidos."""
+        oids = [ObjectId(i) for i in ids if ObjectId.is_valid(i)]
+        docs = [doc async for doc in db.events.find({"_id": {"$in": oids}}, self.PROJECAO)]
+        achados = {str(doc["_id"]) for doc in docs}
+        self.remover_varios([i for i in ids if i not in achados])
+        for doc in docs:
+            self.adicionar(doc)
+
+    def aplicar(self, version: int, inseridos, removidos, limpar: bool):
+        if limpar:
+            self._reiniciar()
+        self.remover_varios(removidos)
+        for doc in inseridos:
+            self.adicionar(doc)
+        # Só avança se nenhuma escrita de outro worker ficou no meio
+        if self.version == version - 1:
+            self.version = version
+
+
+_indices: list[IndiceCatalogo] = []
+
+
+def registrar_indice(indice: IndiceCatalogo):
+    _indices.append(indice)
+
+
+async def registrar_escrita(inseridos=(), removidos=(), limpar: bool = False) -> int:
+    """
+    Deve ser chamada após cada escrita em `events`: incrementa a versão do
+    catálogo e atualiza os índices em memória deste worker.
+    `inseridos` são os documentos gravados (novos ou alterados).
+    """
+    ids = [doc["_id"] for doc in inseridos] + list(removidos)
+    version = await marcar_alteracao(ids, reconstruir=limpar)
+    for indice in _indices:
+        indice.aplicar(version, inseridos, removidos, limpar)
+    return version
@@ -0,0 +1,84 @@
+from datetime import datetime
+from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from app.database import db
+
+
+async def registrar_voto(user_id: ObjectId, event_id: ObjectId, tags: list[str]) -> dict | None:
+    """
+    Registra (ou altera) o voto de tags do usuário em um evento.
+
+    O voto fica no ledger `event_tag_votes` (um documento por usuário/evento)
+    e o evento recebe apenas a diferença em relação ao voto anterior via
+    `$inc`, sem ler nem reescrever o dicionário inteiro.
+    Retorna o `community_tags_count` atualizado, ou None se o evento não existe.
+    """
+    now = datetime.utcnow()
+    previous = await db.event_tag_votes.find_one_and_update(
+        {"user_id": user_id, "event_id": event_id},
+        {"$set": {"tags": tags, "updated_at": now},
+         "$setOnInsert": {"created_at": now}},
+        upsert=True,
+        return_document=ReturnDocument.BEFORE
+    )
+    old_tags = set(previous.get("tags", [])) if previous else set()
+    new_tags = set(tags)
+
+    inc = {f"community_tags_count.{t}": 1 for t in new_tags - old_tags}
+    inc.update({f"community_tags_count.{t}": -1 for t in old_tags - new_tags})
+
+    if inc:
+        event = await db.events.find_one_and_update(
+            {"_id": event_id},
+            {"$inc": inc},
+            projection={"community_tags_count": 1},
+            return_document=ReturnDocument.AFTER
+        )
+    else:
+        # Mesmo voto de antes: nada a incrementar
+        event = await db.events.find_one(
+            {"_id": event_id}, {"community_tags_count": 1})
+    if event is None:
+        return None
+
+    counts = event.get("community_tags_count", {})
+    # Remove tags que zeraram, mantendo a condição para não correr com outro voto
+    for tag in old_tags - new_tags:
+        if counts.get(tag, 0) <= 0:
+            await db.events.update_one(
+                {"_id": event_id, f"community_tags_count.{tag}": {"$lte": 0}},
+                {"$unset": {f"community_tags_count.{tag}": ""}}
+            )
+            counts.pop(tag, None)
+
+    return {"community_tags_count": counts, "added": sorted(new_tags - old_tags)}
+
+
+async def reconstruir_contagens() -> int:
+    """
+    Reconstrói `community_tags_count` de todos os eventos a partir do ledger.
+    Eventos sem nenhum voto registrado no ledger não são alterados.
+    """
+    pipeline = [
+        {"$unwind": "$tags"},
+        {"$group": {"_id": {"event_id": "$event_id", "tag": "$tags"},
+                    "count": {"$sum": 1}}},
+        {"$group": {"_id": "$_id.event_id",
+                    "counts": {"$push": {"k": "$_id.tag", "v": "$count"}}}},
+    ]
+
+    ops = []
+    async for doc in db.event_tag_votes.aggregate(pipeline):
+        counts = {item["k"]: item["v"] for item in doc["counts"]}
+        ops.append(UpdateOne({"_id": doc["_id"]},
+                             {"$set": {"community_tags_count": counts}}))
+
+    if ops:
+        await db.events.bulk_write(ops, ordered=False)
+    return len(ops)
+
+
+async def ensure_indexes():
+    await db.event_tag_votes.create_index(
+        [("user_id", 1), ("event_id", 1)], unique=True)
+    await db.event_tag_votes.create_index("event_id")
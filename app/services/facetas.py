@@ -0,0 +1,56 @@
+import os
+import time
+from app.database import db
+from app.services import catalogo
+
+# Mesmo sem escrita, eventos deixam de ser "próximos" com o tempo
+CACHE_TTL = float(os.environ.get("FACETS_CACHE_TTL", 300))
+MAX_CACHED_SIGNATURES = 1000
+
+# assinatura do filtro -> {"version": int, "expires": float, "result": dict}
+_cache: dict[tuple, dict] = {}
+
+
+def _contagem(campo: str, unwind: bool = False) -> list[dict]:
+    stages = [{"$unwind": f"${campo}"}] if unwind else []
+    return stages + [
+        {"$match": {campo: {"$nin": [None, ""]}}},
+        {"$group": {"_id": f"${campo}", "total": {"$sum": 1}}},
+        {"$sort": {"total": -1, "_id": 1}},
+        {"$project": {"_id": 0, "valor": "$_id", "total": 1}},
+    ]
+
+
+async def contar_facetas(filtro: dict, assinatura: tuple) -> dict:
+    """
+    Conta eventos por tag, categoria principal e cidade com um único
+    `$facet`. O resultado fica em cache pela assinatura do filtro enquanto
+    a versão do catálogo não mudar.
+    """
+    version = await catalogo.versao()
+    now = time.monotonic()
+    entry = _cache.get(assinatura)
+    if entry and entry["version"] == version and entry["expires"] > now:
+        return entry["result"]
+
+    pipeline = [
+        {"$match": filtro},
+        {"$facet": {
+            "total": [{"$count": "total"}],
+            "tags": _contagem("tags", unwind=True),
+            "categorias": _contagem("category_prim.name"),
+            "cidades": _contagem("address.city"),
+        }},
+    ]
+    doc = (await db.events.aggregate(pipeline).to_list(1))[0]
+    result = {
+        "total": doc["total"][0]["total"] if doc["total"] else 0,
+        "tags": doc["tags"],
+        "categorias": doc["categorias"],
+        "cidades": doc["cidades"],
+    }
+
+    if len(_cache) >= MAX_CACHED_SIGNATURES:
+        _cache.clear()
+    _cache[assinatura] = {"version": version, "expires": now + CACHE_TTL, "result": result}
+    return result
@@ -0,0 +1,85 @@
+import os
+import time
+from datetime import datetime
+from bson import ObjectId
+from pymongo import UpdateOne
+from app.database import db
+
+# Tamanho máximo da timeline de cada usuário
+FEED_MAX_ITEMS = int(os.environ.get("FEED_MAX_ITEMS", 200))
+# Acima desse número de amigos o autor não distribui na escrita:
+# os itens ficam no outbox dele e são mesclados na leitura
+FANOUT_MAX_FRIENDS = int(os.environ.get("FEED_FANOUT_MAX_FRIENDS", 1000))
+OUTBOX_IDS_TTL = 60
+
+# ids dos autores que usam outbox (poucos), para evitar a consulta extra
+_outbox_ids: set[str] = set()
+_outbox_ids_loaded_at = 0.0
+
+
+async def _autores_com_outbox() -> set[str]:
+    global _outbox_ids, _outbox_ids_loaded_at
+    if time.monotonic() - _outbox_ids_loaded_at > OUTBOX_IDS_TTL:
+        _outbox_ids = {doc["_id"] async for doc in db.feed_outbox.find({}, {"_id": 1})}
+        _outbox_ids_loaded_at = time.monotonic()
+    return _outbox_ids
+
+
+def _push(item: dict) -> dict:
+    # Mais recentes primeiro, cortando no tamanho máximo
+    return {"$push": {"items": {"$each": [item], "$position": 0, "$slice": FEED_MAX_ITEMS}}}
+
+
+async def publicar(actor: dict, tipo: str, event_id: str | None = None, friend: dict | None = None):
+    """
+    Registra uma atividade do usuário (`like`, `inscricao` ou `amizade`)
+    na timeline dos amigos dele (fan-out na escrita).
+    """
+    item = {
+        "type": tipo,
+        "actor_id": str(actor["_id"]),
+        "actor_name": actor.get("name"),
+        "created_at": datetime.utcnow(),
+    }
+    if event_id:
+        event = await db.events.find_one({"_id": ObjectId(event_id)}, {"name": 1, "image": 1})
+        if not event:
+            return
+        item.update({"event_id": event_id, "event_name": event.get("name"),
+                     "event_image": event.get("image")})
+    if friend:
+        item.update({"friend_id": str(friend["_id"]),
+                    "friend_name": friend.get("name")})
+
+    friends = actor.get("friends", [])
+    if len(friends) > FANOUT_MAX_FRIENDS:
+        await db.feed_outbox.update_one({"_id": item["actor_id"]}, _push(item), upsert=True)
+        _outbox_ids.add(item["actor_id"])
+        return
+
+    recipients = [f for f in friends if f != item.get("friend_id")]
+    if recipients:
+        await db.feed_timelines.bulk_write(
+            [UpdateOne({"_id": r}, _push(item), upsert=True) for r in recipients],
+            ordered=False
+        )
+
+
+async def ler_feed(user: dict, limit: int, offset: int) -> list[dict]:
+    """
+    Lê a timeline do usuário (um acesso pelo _id, já paginado com `$slice`).
+    Amigos com muitos amigos são mesclados a partir do outbox deles.
+    """
+    timeline = await db.feed_timelines.find_one(
+        {"_id": str(user["_id"])}, {"items": {"$slice": [0, offset + limit]}})
+    items = timeline.get("items", []) if timeline else []
+
+    outbox_friends = await _autores_com_outbox() & set(user.get("friends", []))
+    if outbox_friends:
+        async for outbox in db.feed_outbox.find(
+            {"_id": {"$in": list(outbox_friends)}}, {"items": {"$slice": [0, offset + limit]}}
+        ):
+            items.extend(outbox.get("items", []))
+        items.sort(key=lambda i: i["created_at"], reverse=True)
+
+    return items[offset:offset + limit]
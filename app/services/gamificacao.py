@@ -1,38 +1,78 @@
+from bisect import bisect_right
+from datetime import datetime
 from typing import List, Dict
-from app.database import get_database
+from app.database import db
 from app.models.gamificacao import ProgressoResponse, LeaderboardEntry, BadgeInfo
+from app.services.leaderboard import leaderboard, registrar_xp_periodos
 from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
 
 class GamificacaoService:
     
-    # Definição de badges
+    # XP concedido por ação (cada ação é premiada uma única vez por referência)
+    XP_POR_ACAO = {
+        "like": 10,
+        "participacao": 25,
+        "voto_tags": 5,
+        "amizade": 15
+    }
+    
+    # Definição de badges: cada regra é "contador >= minimo"
     BADGES = {
         "primeiro_evento": {
             "nome": "Primeiro Passo",
             "descricao": "Curtiu seu primeiro evento",
-            "requisito": "1 evento curtido"
+            "requisito": "1 evento curtido",
+            "regra": {"contador": "like", "minimo": 1}
         },
         "explorador": {
             "nome": "Explorador",
             "descricao": "Curtiu 5 eventos diferentes",
-            "requisito": "5 eventos curtidos"
+            "requisito": "5 eventos curtidos",
+            "regra": {"contador": "like", "minimo": 5}
         },
         "social": {
             "nome": "Social",
             "descricao": "Adicionou 3 amigos",
-            "requisito": "3 amigos"
+            "requisito": "3 amigos",
+            "regra": {"contador": "amizade", "minimo": 3}
         },
         "veterano": {
             "nome": "Veterano",
             "descricao": "Curtiu 20 eventos",
-            "requisito": "20 eventos curtidos"
+            "requisito": "20 eventos curtidos",
+            "regra": {"contador": "like", "minimo": 20}
         },
         "influencer": {
             "nome": "Influencer",
             "descricao": "Alcançou nível 10",
-            "requisito": "Nível 10"
+            "requisito": "Nível 10",
+            "regra": {"contador": "level", "minimo": 10}
+        },
+        "participativo": {
+            "nome": "Participativo",
+            "descricao": "Participou de 5 eventos",
+            "requisito": "5 participações",
+            "regra": {"contador": "participacao", "minimo": 5}
+        },
+        "ecletico": {
+            "nome": "Eclético",
+            "descricao": "Classificou eventos com 8 tags diferentes",
+            "requisito": "8 tags diferentes",
+            "regra": {"contador": "tags_distintas", "minimo": 8}
         }
     }
+
+    # Onde cada contador fica no documento do usuário
+    CONTADORES = {
+        "like": "stats.like",
+        "participacao": "stats.participacao",
+        "voto_tags": "stats.voto_tags",
+        "amizade": "stats.amizade",
+        "level": "level",
+        "tags_distintas": "stats.tags_distintas"
+    }
     
     # XP necessário para cada nível
     XP_POR_NIVEL = {
@@ -57,18 +97,148 @@ class GamificacaoService:
         19: 9450,
         20: 10450
     }
+
+    # Limiares ordenados (índice 0 = nível 1) usados na busca binária
+    LIMIARES_XP = sorted(XP_POR_NIVEL.values())
     
-    async def calcular_nivel(self, xp: int) -> int:
+    def calcular_nivel(self, xp: int) -> int:
         """Calcula o nível baseado no XP"""
-        nivel = 1
-        for nivel_atual, xp_necessario in self.XP_POR_NIVEL.items():
-            if xp >= xp_necessario:
-                nivel = nivel_atual
-            else:
-                break
-        return nivel
+        return max(1, bisect_right(self.LIMIARES_XP, xp))
+
+    def expressao_nivel(self, campo_xp: str) -> dict:
+        """Mesmo cálculo de calcular_nivel, em expressão do Mongo (para updates atômicos)."""
+        return {"$max": [1, {"$size": {"$filter": {
+            "input": self.LIMIARES_XP,
+            "cond": {"$lte": ["$$this", campo_xp]}
+        }}}]}
+
+    async def conceder_xp(self, usuario_id, acao: str, referencia: str) -> dict | None:
+        """
+        Concede o XP de uma ação ao usuário.
+        `referencia` identifica a ação (ex.: id do evento); repetir a mesma
+        ação/referência não concede XP de novo.
+        """
+        return await self.conceder_xp_lote(usuario_id, acao, [referencia])
+
+    async def conceder_xp_lote(self, usuario_id, acao: str, referencias: list[str]) -> dict | None:
+        """
+        Concede XP para várias referências da mesma ação em uma única escrita.
+
+        A chave de idempotência de cada ação é gravada em `xp_awards` (índice
+        único pelo _id); só as chaves novas contam. XP, contador da ação e
+        nível são atualizados juntos com um update em pipeline.
+        Retorna {xp_ganho, xp, level, level_anterior} ou None se nada foi concedido.
+        """
+        usuario_id = ObjectId(usuario_id)
+        referencias = list(dict.fromkeys(referencias))
+        if not referencias:
+            return None
+
+        agora = datetime.utcnow()
+        docs = [{"_id": f"{acao}:{usuario_id}:{ref}", "user_id": usuario_id,
+                 "acao": acao, "created_at": agora} for ref in referencias]
+        falhas = set()
+        try:
+            await db.xp_awards.insert_many(docs, ordered=False)
+        except BulkWriteError as exc:
+            erros = exc.details.get("writeErrors", [])
+            falhas = {e["index"] for e in erros}
+            # Só chave duplicada (11000) significa ação já premiada antes
+            if any(e.get("code") != 11000 for e in erros):
+                await self._desfazer_chaves(
+                    [d["_id"] for i, d in enumerate(docs) if i not in falhas])
+                raise
+        inseridas = [d["_id"] for i, d in enumerate(docs) if i not in falhas]
+        novas = len(inseridas)
+        if novas == 0:
+            return None
+
+        try:
+            antes = await db.users.find_one_and_update(
+                {"_id": usuario_id},
+                [
+                    {"$set": {
+                        "xp": {"$add": [{"$ifNull": ["$xp", 0]}, novas * self.XP_POR_ACAO[acao]]},
+                        f"stats.{acao}": {"$add": [{"$ifNull": [f"$stats.{acao}", 0]}, novas]}
+                    }},
+                    {"$set": {"level": self.expressao_nivel("$xp")}}
+                ],
+                projection={"xp": 1, "level": 1, f"stats.{acao}": 1, "badges": 1},
+                return_document=ReturnDocument.BEFORE
+            )
+        except Exception:
+            # Sem o XP no usuário as chaves não podem ficar: a nova tentativa premia
+            await self._desfazer_chaves(inseridas)
+            raise
+        if antes is None:
+            await self._desfazer_chaves(inseridas)
+            return None
+
+        xp_ganho = novas * self.XP_POR_ACAO[acao]
+        xp = antes.get("xp", 0) + xp_ganho
+        level = self.calcular_nivel(xp)
+        await leaderboard.publicar_xp(antes.get("xp", 0), xp)
+        await registrar_xp_periodos(usuario_id, xp_ganho)
+
+        # Só as regras dos contadores que mudaram são avaliadas
+        alterados = {acao: antes.get("stats", {}).get(acao, 0) + novas}
+        if level != antes.get("level", 1):
+            alterados["level"] = level
+        await self.avaliar_badges(usuario_id, alterados, antes.get("badges", []))
+
+        return {
+            "xp_ganho": xp_ganho,
+            "xp": xp,
+            "level": level,
+            "level_anterior": antes.get("level", 1)
+        }
+
+    async def _desfazer_chaves(self, chaves: list[str]):
+        if chaves:
+            await db.xp_awards.delete_many({"_id": {"$in": chaves}})
+
+    def regras_para(self, contador: str) -> list[str]:
+        return [badge_id for badge_id, badge in self.BADGES.items()
+                if badge["regra"]["contador"] == contador]
+
+    async def avaliar_badges(self, usuario_id, contadores: Dict[str, int], badges_atuais: List[str]) -> List[str]:
+        """
+        Avalia apenas as regras ligadas aos contadores informados
+        ({contador: valor atual}) e concede os badges atingidos.
+        """
+        novos_badges = [
+            badge_id
+            for contador, valor in contadores.items()
+            for badge_id in self.regras_para(contador)
+            if badge_id not in badges_atuais and valor >= self.BADGES[badge_id]["regra"]["minimo"]
+        ]
+        if novos_badges:
+            await db.users.update_one(
+                {"_id": ObjectId(usuario_id)},
+                {"$addToSet": {"badges": {"$each": novos_badges}}}
+            )
+        return novos_badges
+
+    async def registrar_tags_votadas(self, usuario_id, tags: List[str]) -> List[str]:
+        """Guarda as tags já usadas pelo usuário e atualiza o contador de tags distintas."""
+        usuario = await db.users.find_one_and_update(
+            {"_id": ObjectId(usuario_id)},
+            [
+                {"$set": {"tags_votadas": {"$setUnion": [{"$ifNull": ["$tags_votadas", []]}, tags]}}},
+                {"$set": {"stats.tags_distintas": {"$size": "$tags_votadas"}}}
+            ],
+            projection={"stats.tags_distintas": 1, "badges": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if not usuario:
+            return []
+        return await self.avaliar_badges(
+            usuario_id,
+            {"tags_distintas": usuario["stats"]["tags_distintas"]},
+            usuario.get("badges", [])
+        )
     
-    async def obter_proximo_nivel_xp(self, nivel_atual: int) -> int:
+    def obter_proximo_nivel_xp(self, nivel_atual: int) -> int:
         """Obtém o XP necessário para o próximo nível"""
         proximo_nivel = nivel_atual + 1
         if proximo_nivel in self.XP_POR_NIVEL:
@@ -77,73 +247,97 @@ class GamificacaoService:
     
     async def verificar_badges(self, usuario_id: str) -> List[str]:
         """Verifica e concede badges para o usuário"""
-        db = get_database()
-        usuario = await db.usuarios.find_one({"_id": usuario_id})
+        usuario = await db.users.find_one({"_id": ObjectId(usuario_id)})
         if not usuario:
             return []
         
-        novos_badges = []
-        badges_atuais = usuario.get("badges", [])
-        
-        # Verificar badge "primeiro_evento"
-        if "primeiro_evento" not in badges_atuais and len(usuario.get("eventosCurtidos", [])) >= 1:
-            novos_badges.append("primeiro_evento")
-        
-        # Verificar badge "explorador"
-        if "explorador" not in badges_atuais and len(usuario.get("eventosCurtidos", [])) >= 5:
-            novos_badges.append("explorador")
-        
-        # Verificar badge "social"
-        if "social" not in badges_atuais and len(usuario.get("amigos", [])) >= 3:
-            novos_badges.append("social")
-        
-        # Verificar badge "veterano"
-        if "veterano" not in badges_atuais and len(usuario.get("eventosCurtidos", [])) >= 20:
-            novos_badges.append("veterano")
-        
-        # Verificar badge "influencer"
-        nivel_atual = await self.calcular_nivel(usuario.get("xp", 0))
-        if "influencer" not in badges_atuais and nivel_atual >= 10:
-            novos_badges.append("influencer")
+        stats = usuario.get("stats", {})
+        contadores = {contador: stats.get(contador, 0) for contador in self.XP_POR_ACAO}
+        contadores["tags_distintas"] = stats.get("tags_distintas", 0)
+        contadores["level"] = self.calcular_nivel(usuario.get("xp", 0))
         
-        # Adicionar novos badges ao usuário
-        if novos_badges:
-            await db.usuarios.update_one(
-                {"_id": usuario_id},
-                {"$addToSet": {"badges": {"$each": novos_badges}}}
-            )
-        
-        return novos_badges
+        return await self.avaliar_badges(usuario_id, contadores, usuario.get("badges", []))
+
+    def pipeline_backfill(self, badge_id: str) -> tuple:
+        """
+        Monta a agregação que encontra, a partir dos dados de origem, todos
+        os usuários que já cumprem a regra do badge.
+        Retorna (coleção, pipeline); cada resultado tem o `_id` do usuário.
+        """
+        regra = self.BADGES[badge_id]["regra"]
+        contador, minimo = regra["contador"], regra["minimo"]
+
+        por_usuario = [
+            {"$group": {"_id": "$user_id", "valor": {"$sum": 1}}},
+            {"$match": {"valor": {"$gte": minimo}}}
+        ]
+        if contador == "like":
+            return db.event_reactions, [{"$match": {"reaction": "like"}}, *por_usuario]
+        if contador == "participacao":
+            return db.event_participants, [{"$match": {"status": "confirmed"}}, *por_usuario]
+        if contador == "voto_tags":
+            return db.event_tag_votes, por_usuario
+        if contador == "tags_distintas":
+            return db.event_tag_votes, [
+                {"$unwind": "$tags"},
+                {"$group": {"_id": "$user_id", "tags": {"$addToSet": "$tags"}}},
+                {"$match": {"$expr": {"$gte": [{"$size": "$tags"}, minimo]}}}
+            ]
+        if contador == "amizade":
+            return db.users, [
+                {"$match": {"badges": {"$ne": badge_id},
+                            "$expr": {"$gte": [{"$size": {"$ifNull": ["$friends", []]}}, minimo]}}},
+                {"$project": {"_id": 1}}
+            ]
+        # level: deriva do XP para cobrir usuários com nível desatualizado
+        return db.users, [
+            {"$match": {"badges": {"$ne": badge_id},
+                        "xp": {"$gte": self.LIMIARES_XP[minimo - 1]}}},
+            {"$project": {"_id": 1}}
+        ]
+
+    async def backfill_badge(self, badge_id: str, lote: int = 1000) -> int:
+        """
+        Concede um badge (ex.: regra nova) a todos os usuários que já a
+        cumprem: uma agregação + `bulk_write` em lotes, em vez de N chamadas.
+        """
+        colecao, pipeline = self.pipeline_backfill(badge_id)
+        concedidos = 0
+        ops = []
+        async for doc in colecao.aggregate(pipeline, allowDiskUse=True):
+            ops.append(UpdateOne({"_id": doc["_id"], "badges": {"$ne": badge_id}},
+                                 {"$addToSet": {"badges": badge_id}}))
+            if len(ops) >= lote:
+                concedidos += (await db.users.bulk_write(ops, ordered=False)).modified_count
+                ops = []
+        if ops:
+            concedidos += (await db.users.bulk_write(ops, ordered=False)).modified_count
+        return concedidos
     
     async def atualizar_nivel_usuario(self, usuario_id: str) -> int:
         """Atualiza o nível do usuário baseado no XP"""
-        db = get_database()
-        usuario = await db.usuarios.find_one({"_id": usuario_id})
+        usuario = await db.users.find_one_and_update(
+            {"_id": ObjectId(usuario_id)},
+            [{"$set": {"level": self.expressao_nivel({"$ifNull": ["$xp", 0]})}}],
+            projection={"level": 1},
+            return_document=ReturnDocument.AFTER
+        )
         if not usuario:
             return 1
-        
-        xp_atual = usuario.get("xp", 0)
-        novo_nivel = await self.calcular_nivel(xp_atual)
-        
-        # Atualizar nível no banco
-        await db.usuarios.update_one(
-            {"_id": usuario_id},
-            {"$set": {"nivel": novo_nivel}}
-        )
-        
-        return novo_nivel
+        return usuario["level"]
     
     async def obter_progresso_usuario(self, usuario_id: str) -> ProgressoResponse:
         """Obtém o progresso completo do usuário"""
-        db = get_database()
-        usuario = await db.usuarios.find_one({"_id": usuario_id})
+        usuario = await db.users.find_one(
+            {"_id": ObjectId(usuario_id)}, {"xp": 1, "level": 1, "badges": 1, "stats": 1})
         if not usuario:
             return None
         
+        # nível já persistido junto com o XP: leitura O(1)
         xp = usuario.get("xp", 0)
-        nivel = await self.calcular_nivel(xp)
-        proximo_nivel_xp = await self.obter_proximo_nivel_xp(nivel)
-        eventos_curtidos = len(usuario.get("eventosCurtidos", []))
+        nivel = usuario.get("level") or self.calcular_nivel(xp)
+        proximo_nivel_xp = self.obter_proximo_nivel_xp(nivel)
+        eventos_curtidos = usuario.get("stats", {}).get("like", 0)
         badges = usuario.get("badges", [])
         
         return ProgressoResponse(
@@ -156,29 +350,12 @@ class GamificacaoService:
         )
     
     async def obter_leaderboard(self, limit: int = 10) -> List[LeaderboardEntry]:
-        """Obtém o ranking dos usuários"""
-        db = get_database()
-        
-        usuarios = []
-        async for usuario in db.usuarios.find().sort("xp", -1).limit(limit):
-            usuarios.append(LeaderboardEntry(
-                usuario_id=str(usuario["_id"]),
-                nome=usuario["nome"],
-                xp=usuario.get("xp", 0),
-                nivel=await self.calcular_nivel(usuario.get("xp", 0)),
-                posicao=0  # Será definido abaixo
-            ))
-        
-        # Definir posições
-        for i, usuario in enumerate(usuarios):
-            usuario.posicao = i + 1
-        
-        return usuarios
+        """Obtém o ranking dos usuários (empates dividem a posição)"""
+        return [LeaderboardEntry(**entry) for entry in await leaderboard.top(limit)]
     
     async def obter_badges_disponiveis(self, usuario_id: str) -> List[BadgeInfo]:
         """Obtém informações sobre todos os badges disponíveis"""
-        db = get_database()
-        usuario = await db.usuarios.find_one({"_id": usuario_id})
+        usuario = await db.users.find_one({"_id": ObjectId(usuario_id)}, {"badges": 1})
         if not usuario:
             return []
         
@@ -194,3 +371,10 @@ class GamificacaoService:
             ))
         
         return badges_info
+
+
+gamificacao_service = GamificacaoService()
+
+
+async def ensure_indexes():
+    await db.xp_awards.create_index("user_id")
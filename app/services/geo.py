@@ -0,0 +1,75 @@
+import math
+import os
+from pymongo import UpdateOne
+from app.database import db
+
+RAIO_TERRA_KM = 6371.0
+# Bônus máximo de proximidade nas recomendações e a distância em que ele cai a ~37%
+PESO_PROXIMIDADE = float(os.environ.get("RECOMMENDATION_PROXIMITY_WEIGHT", 2.0))
+ESCALA_PROXIMIDADE_KM = float(os.environ.get("RECOMMENDATION_PROXIMITY_SCALE_KM", 10.0))
+MIGRATION_BATCH = 1000
+
+
+def ponto_geojson(address: dict | None) -> dict | None:
+    """Converte `address.lat`/`address.lon` (strings) em um ponto GeoJSON."""
+    if not isinstance(address, dict):
+        return None
+    try:
+        lat = float(str(address.get("lat")).replace(",", "."))
+        lon = float(str(address.get("lon")).replace(",", "."))
+    except ValueError:
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None
+    # GeoJSON usa [longitude, latitude]
+    return {"type": "Point", "coordinates": [lon, lat]}
+
+
+def distancia_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Distância pela fórmula de haversine."""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * RAIO_TERRA_KM * math.asin(math.sqrt(a))
+
+
+def bonus_proximidade(location: dict | None, lat: float, lon: float) -> float:
+    """Bônus de afinidade que decai com a distância até o evento."""
+    if not location:
+        return 0.0
+    ev_lon, ev_lat = location["coordinates"]
+    return PESO_PROXIMIDADE * math.exp(-distancia_km(lat, lon, ev_lat, ev_lon) / ESCALA_PROXIMIDADE_KM)
+
+
+async def migrar_localizacoes() -> dict:
+    """
+    Preenche `location` (GeoJSON) nos eventos que só têm lat/lon em texto.
+    Pode ser executada mais de uma vez: só toca eventos sem `location`.
+    """
+    convertidos = invalidos = 0
+    ops = []
+    async for ev in db.events.find(
+        {"location": {"$exists": False}, "address.lat": {"$nin": [None, ""]}},
+        {"address.lat": 1, "address.lon": 1}
+    ):
+        ponto = ponto_geojson(ev.get("address"))
+        if ponto is None:
+            invalidos += 1
+            continue
+        ops.append(UpdateOne({"_id": ev["_id"]}, {"$set": {"location": ponto}}))
+        if len(ops) >= MIGRATION_BATCH:
+            convertidos += (await db.events.bulk_write(ops, ordered=False)).modified_count
+            ops = []
+    if ops:
+        convertidos += (await db.events.bulk_write(ops, ordered=False)).modified_count
+    return {"convertidos": convertidos, "invalidos": invalidos}
+
+
+async def ensure_indexes():
+    # Importações antigas da Sympla guardavam o nome do local em `location`
+    # (texto), o que impede o índice 2dsphere: move para `address.name`
+    await db.events.update_many({"location": {"$type": "string"}}, [
+        {"$set": {"address": {"$ifNull": ["$address", {"name": "$location"}]}}},
+        {"$unset": "location"},
+    ])
+    await db.events.create_index([("location", "2dsphere")])
@@ -0,0 +1,267 @@
+import os
+import time
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import UpdateOne
+from app.database import db
+from app.services import alteracoes
+
+REFRESH_SECONDS = float(os.environ.get("LEADERBOARD_REFRESH_SECONDS", 600))
+# De quanto em quanto tempo confere o XP concedido por outros workers
+CHECK_SECONDS = float(os.environ.get("LEADERBOARD_CHECK_SECONDS", 5))
+# Uma versão que não aparece no log por mais que isso força a reconstrução
+GAP_SECONDS = 30
+LOG_ID = "xp"
+
+
+def entrada_ranking(usuario_id, usuario: dict, xp: int, posicao: int) -> dict:
+    return {
+        "usuario_id": str(usuario_id),
+        "nome": usuario.get("name", ""),
+        "xp": xp,
+        "nivel": usuario.get("level", 1),
+        "posicao": posicao,
+    }
+
+
+def classificar(linhas) -> list[dict]:
+    """
+    Monta o ranking a partir de (usuario_id, usuario, xp) já ordenados por
+    XP decrescente; empates dividem a mesma posição.
+    """
+    ranking = []
+    for usuario_id, usuario, xp in linhas:
+        posicao = ranking[-1]["posicao"] if ranking and ranking[-1]["xp"] == xp else len(ranking) + 1
+        ranking.append(entrada_ranking(usuario_id, usuario, xp, posicao))
+    return ranking
+
+
+class FenwickTree:
+    """Árvore de Fenwick: soma de prefixos e atualização pontual em O(log n)."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.tree = [0] * (size + 1)
+
+    def add(self, index: int, delta: int):
+        i = index + 1
+        while i <= self.size:
+            self.tree[i] += delta
+            i += i & -i
+
+    def prefix(self, index: int) -> int:
+        """Soma das posições 0..index."""
+        i = min(index, self.size - 1) + 1
+        total = 0
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+
+class Leaderboard:
+    """
+    Estrutura de estatística de ordem sobre o XP dos usuários.
+
+    Guarda um histograma de XP em uma árvore de Fenwick, então "quantos
+    usuários têm mais XP que x" custa O(log n), independente da posição.
+    Cada XP concedido entra no log de alterações (`alteracoes`, log "xp");
+    os workers aplicam as entradas novas a cada CHECK_SECONDS e reconstroem
+    tudo periodicamente (uma agregação por valor de XP).
+    """
+
+    def __init__(self):
+        self.tree = FenwickTree(1024)
+        self.total = 0
+        self.loaded_at = 0.0
+        self.version = -1
+        self.checked_at = 0.0
+        self.gap_since: float | None = None
+
+    async def ensure_loaded(self):
+        now = time.monotonic()
+        if self.version < 0 or now - self.loaded_at >= REFRESH_SECONDS:
+            await self._reconstruir()
+        elif now - self.checked_at >= CHECK_SECONDS:
+            await self._acompanhar()
+
+    async def _reconstruir(self):
+        version = await alteracoes.versao(LOG_ID)
+        histogram = {}
+        async for doc in db.users.aggregate([
+            {"$group": {"_id": {"$ifNull": ["$xp", 0]}, "count": {"$sum": 1}}}
+        ]):
+            histogram[int(doc["_id"])] = doc["count"]
+
+        size = 1024
+        while histogram and size <= max(histogram):
+            size *= 2
+        tree = FenwickTree(size)
+        for xp, count in histogram.items():
+            tree.add(xp, count)
+
+        self.tree = tree
+        self.total = sum(histogram.values())
+        self.version = version
+        self.loaded_at = self.checked_at = time.monotonic()
+        self.gap_since = None
+
+    async def _acompanhar(self):
+        """Aplica o XP concedido em outros workers desde a última versão vista."""
+        self.checked_at = time.monotonic()
+        atual = await alteracoes.versao(LOG_ID)
+        if atual == self.version:
+            self.gap_since = None
+            return
+        for entrada in await alteracoes.ler(LOG_ID, self.version, atual):
+            self.registrar_xp(entrada["dados"]["de"], entrada["dados"]["para"])
+            self.version = entrada["version"]
+        if self.version == atual:
+            self.gap_since = None
+        elif self.gap_since is None:
+            self.gap_since = self.checked_at
+        elif self.checked_at - self.gap_since > GAP_SECONDS:
+            await self._reconstruir()
+
+    async def publicar_xp(self, xp_anterior: int | None, xp_novo: int):
+        """Registra a mudança no log e aplica aqui se não houver versão no meio."""
+        version = await alteracoes.registrar(LOG_ID, {"de": xp_anterior, "para": xp_novo})
+        if self.version == version - 1:
+            self.registrar_xp(xp_anterior, xp_novo)
+            self.version = version
+
+    def _grow(self, xp: int):
+        if xp < self.tree.size:
+            return
+        size = self.tree.size
+        while size <= xp:
+            size *= 2
+        tree = FenwickTree(size)
+        for value in range(self.tree.size):
+            count = self.tree.prefix(value) - (self.tree.prefix(value - 1) if value else 0)
+            if count:
+                tree.add(value, count)
+        self.tree = tree
+
+    def registrar_xp(self, xp_anterior: int | None, xp_novo: int):
+        """Move o usuário de xp_anterior para xp_novo (None = usuário novo)."""
+        self._grow(xp_novo)
+        if xp_anterior is None:
+            self.total += 1
+        else:
+            self.tree.add(xp_anterior, -1)
+        self.tree.add(xp_novo, 1)
+
+    def usuarios_acima(self, xp: int) -> int:
+        return self.total - self.tree.prefix(xp)
+
+    def posicao_para_xp(self, xp: int) -> int:
+        # Empates dividem a mesma posição
+        return self.usuarios_acima(xp) + 1
+
+    async def top(self, limit: int) -> list[dict]:
+        await self.ensure_loaded()
+        cursor = db.users.find({}, {"name": 1, "xp": 1, "level": 1}).sort(
+            [("xp", -1), ("_id", 1)]).limit(limit)
+        return [self._entry(u) async for u in cursor]
+
+    async def posicao(self, usuario_id: str, vizinhos: int = 0) -> dict | None:
+        """Posição do usuário e, opcionalmente, os `vizinhos` acima e abaixo dele."""
+        await self.ensure_loaded()
+        user_oid = ObjectId(usuario_id)
+        usuario = await db.users.find_one({"_id": user_oid}, {"name": 1, "xp": 1, "level": 1})
+        if not usuario:
+            return None
+
+        xp = usuario.get("xp", 0)
+        result = {
+            "usuario": self._entry(usuario),
+            "total_usuarios": self.total,
+            "acima": [],
+            "abaixo": [],
+        }
+        if vizinhos > 0:
+            # Mesma ordem do top: xp desc, _id asc
+            acima = db.users.find(
+                {"$or": [{"xp": {"$gt": xp}}, {"xp": xp, "_id": {"$lt": user_oid}}]},
+                {"name": 1, "xp": 1, "level": 1}
+            ).sort([("xp", 1), ("_id", -1)]).limit(vizinhos)
+            result["acima"] = [self._entry(u) async for u in acima][::-1]
+
+            abaixo = db.users.find(
+                {"$or": [{"xp": {"$lt": xp}}, {"xp": xp, "_id": {"$gt": user_oid}}]},
+                {"name": 1, "xp": 1, "level": 1}
+            ).sort([("xp", -1), ("_id", 1)]).limit(vizinhos)
+            result["abaixo"] = [self._entry(u) async for u in abaixo]
+        return result
+
+    def _entry(self, usuario: dict) -> dict:
+        xp = usuario.get("xp", 0)
+        return entrada_ranking(usuario["_id"], usuario, xp, self.posicao_para_xp(xp))
+
+
+leaderboard = Leaderboard()
+
+
+# 🔹 Rankings por período (semanal/mensal)
+
+PERIODOS = ("semanal", "mensal")
+
+
+def chave_periodo(periodo: str, quando: datetime) -> tuple[str, datetime]:
+    """Retorna a chave do bucket (ex.: 2026-W42, 2026-10) e quando ele expira."""
+    if periodo == "semanal":
+        ano, semana, _ = quando.isocalendar()
+        inicio = (quando - timedelta(days=quando.weekday())).replace(
+            hour=0, minute=0, second=0, microsecond=0)
+        # mantém a semana anterior visível por mais uma semana
+        return f"{ano}-W{semana:02d}", inicio + timedelta(weeks=2)
+    inicio = quando.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    return f"{quando.year}-{quando.month:02d}", inicio + timedelta(days=62)
+
+
+async def registrar_xp_periodos(usuario_id: ObjectId, xp_ganho: int):
+    """Soma o XP ganho nos buckets da semana e do mês atuais."""
+    agora = datetime.utcnow()
+    ops = []
+    for periodo in PERIODOS:
+        chave, expira = chave_periodo(periodo, agora)
+        ops.append(UpdateOne(
+            {"periodo": periodo, "chave": chave, "user_id": usuario_id},
+            {"$inc": {"xp": xp_ganho}, "$setOnInsert": {"expires_at": expira}},
+            upsert=True
+        ))
+    await db.xp_periods.bulk_write(ops, ordered=False)
+
+
+async def top_periodo(periodo: str, limit: int) -> list[dict]:
+    chave, _ = chave_periodo(periodo, datetime.utcnow())
+    buckets = [b async for b in db.xp_periods.find(
+        {"periodo": periodo, "chave": chave}, {"user_id": 1, "xp": 1}
+    ).sort([("xp", -1), ("user_id", 1)]).limit(limit)]
+
+    usuarios = {}
+    async for u in db.users.find(
+        {"_id": {"$in": [b["user_id"] for b in buckets]}}, {"name": 1, "level": 1}
+    ):
+        usuarios[u["_id"]] = u
+
+    return classificar((b["user_id"], usuarios.get(b["user_id"], {}), b["xp"]) for b in buckets)
+
+
+async def ranking_amigos(usuario: dict) -> list[dict]:
+    """Ranking entre o usuário e os amigos dele, com uma única consulta `$in`."""
+    ids = [usuario["_id"]] + [ObjectId(f) for f in usuario.get("friends", [])]
+    usuarios = [u async for u in db.users.find(
+        {"_id": {"$in": ids}}, {"name": 1, "xp": 1, "level": 1}
+    ).sort([("xp", -1), ("_id", 1)])]
+    return classificar((u["_id"], u, u.get("xp", 0)) for u in usuarios)
+
+
+async def ensure_indexes():
+    await db.xp_periods.create_index(
+        [("periodo", 1), ("chave", 1), ("user_id", 1)], unique=True)
+    await db.xp_periods.create_index(
+        [("periodo", 1), ("chave", 1), ("xp", -1), ("user_id", 1)])
+    # buckets vencidos são apagados pelo próprio Mongo
+    await db.xp_periods.create_index("expires_at", expireAfterSeconds=0)
@@ -0,0 +1,139 @@
+import asyncio
+import base64
+from datetime import datetime
+from bson import ObjectId
+from pymongo import UpdateOne
+from app.database import db
+
+STATUSES = ("confirmed", "waitlist")
+MAX_PAGE_SIZE = 100
+
+
+# 🔹 Contadores mantidos na escrita (evitam count_documents na leitura)
+
+async def ajustar_contadores(event_id: ObjectId, user_id: ObjectId, status: str, delta: int):
+    """Incrementa `participant_counts.<status>` no evento e `participation_counts.<status>` no usuário."""
+    await asyncio.gather(
+        db.events.update_one(
+            {"_id": event_id}, {"$inc": {f"participant_counts.{status}": delta}}),
+        db.users.update_one(
+            {"_id": user_id}, {"$inc": {f"participation_counts.{status}": delta}}),
+    )
+
+
+async def mover_contadores(event_id: ObjectId, user_id: ObjectId, old_status: str, new_status: str):
+    await asyncio.gather(
+        db.events.update_one({"_id": event_id}, {"$inc": {
+            f"participant_counts.{old_status}": -1,
+            f"participant_counts.{new_status}": 1}}),
+        db.users.update_one({"_id": user_id}, {"$inc": {
+            f"participation_counts.{old_status}": -1,
+            f"participation_counts.{new_status}": 1}}),
+    )
+
+
+def total_from_counts(counts: dict | None, status: str | None) -> int:
+    counts = counts or {}
+    if status:
+        return counts.get(status, 0)
+    return sum(counts.get(s, 0) for s in STATUSES)
+
+
+async def reconstruir_contadores() -> dict:
+    """Recalcula os contadores de eventos e usuários a partir de `event_participants`."""
+    result = {}
+    for owner, collection, field in (
+        ("event_id", db.events, "participant_counts"),
+        ("user_id", db.users, "participation_counts"),
+    ):
+        ops = []
+        async for doc in db.event_participants.aggregate([
+            {"$group": {"_id": {"owner": f"${owner}", "status": "$status"},
+                        "count": {"$sum": 1}}},
+            {"$group": {"_id": "$_id.owner",
+                        "counts": {"$push": {"k": "$_id.status", "v": "$count"}}}},
+        ]):
+            counts = {item["k"]: item["v"] for item in doc["counts"]}
+            ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {field: counts}}))
+        if ops:
+            await collection.bulk_write(ops, ordered=False)
+        result[field] = len(ops)
+    return result
+
+
+# 🔹 Paginação por keyset em (created_at, _id)
+
+def encode_cursor(doc: dict) -> str:
+    raw = f"{doc['created_at'].isoformat()}|{doc['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, ObjectId]:
+    raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+    created_at, _id = raw.split("|")
+    return datetime.fromisoformat(created_at), ObjectId(_id)
+
+
+def keyset_match(cursor: str | None) -> dict:
+    if not cursor:
+        return {}
+    created_at, _id = decode_cursor(cursor)
+    return {"$or": [
+        {"created_at": {"$gt": created_at}},
+        {"created_at": created_at, "_id": {"$gt": _id}},
+    ]}
+
+
+async def listar_pagina(match: dict, lookup: dict, limit: int, cursor: str | None,
+                        arquivo: tuple[str, str, dict] | None = None) -> tuple[list[dict], str | None]:
+    """
+    Executa uma única agregação: filtro + keyset, ordenação pelo índice,
+    `$lookup` projetado no documento relacionado e `$limit`.
+    `arquivo` = (coleção, campo local, projeção) de uma coleção de arquivo
+    (ex.: `events_archive`), consultada com um `$in` só para os itens que o
+    `$lookup` não achou; esses itens voltam com `arquivado=True`.
+    Retorna os itens da página e o cursor da próxima página (ou None).
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    pipeline = [
+        {"$match": {**match, **keyset_match(cursor)}},
+        {"$sort": {"created_at": 1, "_id": 1}},
+        {"$limit": limit + 1},
+        {"$lookup": lookup},
+        {"$unwind": {"path": "$related", "preserveNullAndEmptyArrays": True}},
+    ]
+    docs = [doc async for doc in db.event_participants.aggregate(pipeline)]
+
+    # O item extra só indica se há próxima página
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1])
+
+    sem_relacionado = [doc for doc in docs if not doc.get("related")]
+    arquivados = {}
+    if arquivo and sem_relacionado:
+        collection, local_field, fields = arquivo
+        arquivados = {d["_id"]: d async for d in db[collection].find(
+            {"_id": {"$in": list({doc[local_field] for doc in sem_relacionado})}}, fields)}
+
+    # Nenhum item é descartado depois do $limit, senão a página viria curta
+    for doc in docs:
+        doc["arquivado"] = False
+    for doc in sem_relacionado:
+        relacionado = arquivados.get(doc[arquivo[1]]) if arquivo else None
+        doc["related"] = relacionado or {}
+        doc["arquivado"] = relacionado is not None
+    return docs, next_cursor
+
+
+def lookup_projetado(collection: str, local_field: str, fields: dict) -> dict:
+    return {
+        "from": collection,
+        "let": {"ref": f"${local_field}"},
+        "pipeline": [
+            {"$match": {"$expr": {"$eq": ["$_id", "$$ref"]}}},
+            {"$project": fields},
+        ],
+        "as": "related",
+    }
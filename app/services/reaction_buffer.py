@@ -0,0 +1,197 @@
+import asyncio
+import logging
+import os
+import time
+from collections import defaultdict
+from datetime import datetime
+from bson import ObjectId
+from pymongo import UpdateOne
+from app.database import db
+from app.services import trending
+from app.services.gamificacao import gamificacao_service
+
+logger = logging.getLogger(__name__)
+
+
+async def likes_existentes(pares) -> set[tuple[str, str]]:
+    """
+    Pares (user_id, event_id) que já estão gravados como like, com uma única
+    consulta `$in`. Só uma mudança para like conta no trending e dá XP.
+    """
+    pares = set(pares)
+    if not pares:
+        return set()
+    cursor = db.event_reactions.find({
+        "user_id": {"$in": list({ObjectId(u) for u, _ in pares})},
+        "event_id": {"$in": list({ObjectId(e) for _, e in pares})},
+        "reaction": "like",
+    }, {"user_id": 1, "event_id": 1})
+    existentes = {(str(r["user_id"]), str(r["event_id"])) async for r in cursor}
+    return existentes & pares
+
+
+class BufferCheio(Exception):
+    """O buffer atingiu REACTIONS_BUFFER_MAX e o flush ainda não o esvaziou."""
+
+
+class ReactionBuffer:
+    """
+    Modo write-behind para reações (like/dislike).
+
+    Cliques repetidos do mesmo usuário no mesmo evento são agrupados em
+    memória e gravados periodicamente com um único `bulk_write` não ordenado.
+    A existência do evento é validada contra um conjunto de ids em cache.
+    """
+
+    def __init__(self):
+        self.enabled = os.environ.get("REACTIONS_WRITE_BEHIND", "0") == "1"
+        self.flush_interval = float(
+            os.environ.get("REACTIONS_FLUSH_INTERVAL", 1.0))
+        self.max_size = int(os.environ.get("REACTIONS_BUFFER_MAX", 10000))
+        self.event_ids_ttl = float(
+            os.environ.get("REACTIONS_EVENT_IDS_TTL", 300))
+
+        # (user_id, event_id) -> (reaction, created_at)
+        self._pending: dict[tuple[str, str], tuple[str, datetime]] = {}
+        self._lock = asyncio.Lock()
+        # Acorda o flusher antes do intervalo quando o buffer enche
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+        self._event_ids: set[str] = set()
+        self._event_ids_loaded_at = 0.0
+
+        self.received = 0
+        self.rejected = 0
+        self._pending_received = 0
+        self.flushed_received = 0
+        self.written = 0
+        self.flushes = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    # 🔹 Cache de ids de eventos
+
+    async def _load_event_ids(self):
+        self._event_ids = {str(ev["_id"]) async for ev in db.events.find({}, {"_id": 1})}
+        self._event_ids_loaded_at = time.monotonic()
+
+    async def event_exists(self, event_id: str) -> bool:
+        if time.monotonic() - self._event_ids_loaded_at > self.event_ids_ttl:
+            await self._load_event_ids()
+        if event_id in self._event_ids:
+            return True
+
+        # Evento criado depois da última carga: confirma no banco
+        if not ObjectId.is_valid(event_id):
+            return False
+        if await db.events.find_one({"_id": ObjectId(event_id)}, {"_id": 1}):
+            self._event_ids.add(event_id)
+            return True
+        return False
+
+    def forget_event(self, event_id: str):
+        self._event_ids.discard(event_id)
+
+    # 🔹 Buffer
+
+    async def add(self, user_id: str, event_id: str, reaction: str):
+        # Sem await entre a checagem e a inserção: o limite não é ultrapassado
+        if len(self._pending) >= self.max_size and (user_id, event_id) not in self._pending:
+            # Buffer cheio: o flush fica com o flusher em segundo plano e o
+            # cliente recebe backpressure em vez de esperar (ou de um 500)
+            self.rejected += 1
+            self._wake.set()
+            raise BufferCheio()
+
+        self._pending[(user_id, event_id)] = (reaction, datetime.utcnow())
+        self.received += 1
+        self._pending_received += 1
+
+    async def flush(self) -> int:
+        async with self._lock:
+            if not self._pending:
+                return 0
+            pending, self._pending = self._pending, {}
+            pending_received, self._pending_received = self._pending_received, 0
+
+            ops = [
+                UpdateOne(
+                    {"user_id": ObjectId(user_id),
+                     "event_id": ObjectId(event_id)},
+                    {"$set": {"reaction": reaction, "created_at": created_at}},
+                    upsert=True
+                )
+                for (user_id, event_id), (reaction, created_at) in pending.items()
+            ]
+
+            start = time.perf_counter()
+            try:
+                ja_curtidos = await likes_existentes(
+                    key for key, (reaction, _) in pending.items() if reaction == "like")
+                await db.event_reactions.bulk_write(ops, ordered=False)
+            except Exception:
+                # Devolve ao buffer sem sobrescrever cliques mais recentes
+                for key, value in pending.items():
+                    self._pending.setdefault(key, value)
+                self._pending_received += pending_received
+                raise
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+            likes_por_usuario = defaultdict(list)
+            for (user_id, event_id), (reaction, _) in pending.items():
+                if reaction == "like" and (user_id, event_id) not in ja_curtidos:
+                    likes_por_usuario[user_id].append(event_id)
+            await trending.record_activity_many(
+                [eid for eids in likes_por_usuario.values() for eid in eids], "likes")
+            for user_id, event_ids in likes_por_usuario.items():
+                await gamificacao_service.conceder_xp_lote(user_id, "like", event_ids)
+
+            self.flushed_received += pending_received
+            self.written += len(ops)
+            self.flushes += 1
+            self.last_flush_ms = elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+            self.total_flush_ms += elapsed_ms
+            return len(ops)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Erro ao gravar reações em lote")
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    def metrics(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "pending": len(self._pending),
+            "received": self.received,
+            "rejected": self.rejected,
+            "written": self.written,
+            # fração dos cliques que não viraram escrita no banco
+            "coalescing_ratio": round(1 - self.written / self.flushed_received, 3) if self.flushed_received else 0.0,
+            "flushes": self.flushes,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "avg_flush_ms": round(self.total_flush_ms / self.flushes, 2) if self.flushes else 0.0,
+            "max_flush_ms": round(self.max_flush_ms, 2),
+        }
+
+
+reaction_buffer = ReactionBuffer()
@@ -0,0 +1,187 @@
+import asyncio
+import os
+import signal
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from pymongo import MongoClient, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from app.database import db, MONGO_URI, DB_NAME
+from app.services import alteracoes, catalogo, geo
+from app.services.scraper_clubinho import CATEGORIES, scrape_all
+
+# O worker renova `updated_at` nesse intervalo enquanto o job roda
+HEARTBEAT_SECONDS = float(os.environ.get("SCRAPE_JOB_HEARTBEAT_SECONDS", 30))
+# Um job "executando" sem heartbeat há mais tempo que isso é considerado morto
+STALE_SECONDS = float(os.environ.get("SCRAPE_JOB_STALE_SECONDS", 4 * HEARTBEAT_SECONDS))
+# Tempo para o worker fechar os navegadores no desligamento
+SHUTDOWN_SECONDS = 15
+
+# Selenium roda fora do processo da API, sem bloquear o event loop
+_executor: ProcessPoolExecutor | None = None
+_tarefas: set[asyncio.Task] = set()
+
+
+def _encerrar_worker(signum, frame):
+    # Vira exceção para os `finally` fecharem os navegadores
+    raise SystemExit(f"sinal {signum}")
+
+
+def _iniciar_worker():
+    signal.signal(signal.SIGTERM, _encerrar_worker)
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=1, initializer=_iniciar_worker)
+    return _executor
+
+
+def _executar_no_worker(job_id: str, organizer_id: str) -> int:
+    """
+    Roda no processo separado, com cliente síncrono próprio: faz o scraping,
+    grava o progresso de cada categoria, insere os eventos e finaliza o job.
+    A API recebe os ids inseridos pelo log de alterações do catálogo.
+    """
+    mongo = MongoClient(MONGO_URI)
+    database = mongo[DB_NAME]
+    jobs = database.scrape_jobs
+    parar = threading.Event()
+
+    def heartbeat():
+        while not parar.wait(HEARTBEAT_SECONDS):
+            jobs.update_one({"_id": job_id, "active": True},
+                            {"$set": {"updated_at": datetime.utcnow()}})
+
+    def on_category(categoria: str, total: int, erro: str | None):
+        update = {
+            f"categorias.{categoria}": {"status": "erro" if erro else "concluida",
+                                        "eventos": total, "erro": erro},
+            "updated_at": datetime.utcnow(),
+        }
+        jobs.update_one({"_id": job_id}, {"$set": update, "$inc": {
+            "categorias_concluidas": 1, "eventos_coletados": total}})
+
+    batimento = threading.Thread(target=heartbeat, daemon=True)
+    batimento.start()
+    try:
+        raw_events = scrape_all(on_category)
+        inseridos = 0
+        if raw_events:
+            docs = [montar_documento(ev, organizer_id) for ev in raw_events]
+            ids = database.events.insert_many(docs).inserted_ids
+            inseridos = len(ids)
+            # Mesma entrada que catalogo.registrar_escrita grava no log de alterações
+            version = database.registry_versions.find_one_and_update(
+                {"_id": catalogo.VERSION_ID}, {"$inc": {"version": 1}},
+                upsert=True, return_document=ReturnDocument.AFTER)["version"]
+            database.change_log.insert_one(alteracoes.documento(
+                catalogo.VERSION_ID, version, catalogo.dados_alteracao(ids)))
+        jobs.update_one({"_id": job_id}, {
+            "$set": {"status": "concluido", "eventos_inseridos": inseridos,
+                     "finished_at": datetime.utcnow(), "updated_at": datetime.utcnow()},
+            "$unset": {"active": ""}})
+        return inseridos
+    except BaseException as exc:
+        jobs.update_one({"_id": job_id, "active": True}, {
+            "$set": {"status": "erro", "erro": str(exc) or type(exc).__name__,
+                     "finished_at": datetime.utcnow(), "updated_at": datetime.utcnow()},
+            "$unset": {"active": ""}})
+        raise
+    finally:
+        parar.set()
+        mongo.close()
+
+
+async def iniciar(current_user: dict) -> str | None:
+    """Cria o job e o dispara; None se já há um scraping em andamento."""
+    # Libera a trava de um job que morreu sem finalizar
+    await db.scrape_jobs.update_many(
+        {"active": True, "updated_at": {"$lt": datetime.utcnow() - timedelta(seconds=STALE_SECONDS)}},
+        {"$set": {"status": "erro", "erro": "Job interrompido"}, "$unset": {"active": ""}}
+    )
+
+    job_id = uuid.uuid4().hex
+    now = datetime.utcnow()
+    try:
+        await db.scrape_jobs.insert_one({
+            "_id": job_id,
+            "status": "executando",
+            "active": True,  # índice único parcial: só um job ativo
+            "requested_by": str(current_user["_id"]),
+            "categorias": {c: {"status": "pendente", "eventos": 0, "erro": None} for c in CATEGORIES},
+            "categorias_total": len(CATEGORIES),
+            "categorias_concluidas": 0,
+            "eventos_coletados": 0,
+            "started_at": now,
+            "updated_at": now,
+        })
+    except DuplicateKeyError:
+        return None
+
+    task = asyncio.create_task(_executar(job_id, str(current_user["_id"])))
+    _tarefas.add(task)
+    task.add_done_callback(_tarefas.discard)
+    return job_id
+
+
+def montar_documento(ev: dict, organizer_id: str) -> dict:
+    doc = {
+        "name": ev.get("name"),
+        "detail": ev.get("detail"),
+        "start_date": ev.get("start_date"),
+        "end_date": ev.get("end_date"),
+        "private_event": ev.get("private_event", 0),
+        "published": ev.get("published", 1),
+        "cancelled": ev.get("cancelled", 0),
+        "image": ev.get("image"),
+        "url": ev.get("url"),
+        "address": ev.get("address"),
+        "host": ev.get("host"),
+        "category_prim": ev.get("category_prim"),
+        "category_sec": ev.get("category_sec"),
+        "organizer_id": organizer_id,
+        "created_at": ev.get("created_at", datetime.utcnow()),
+    }
+    location = geo.ponto_geojson(doc["address"])
+    if location:
+        doc["location"] = location
+    return doc
+
+
+async def _executar(job_id: str, organizer_id: str):
+    try:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(_get_executor(), _executar_no_worker, job_id, organizer_id)
+    except Exception as exc:
+        # O worker já finaliza o job; isto cobre um processo que morreu antes
+        await db.scrape_jobs.update_one({"_id": job_id, "active": True}, {
+            "$set": {"status": "erro", "erro": str(exc) or type(exc).__name__,
+                     "finished_at": datetime.utcnow(), "updated_at": datetime.utcnow()},
+            "$unset": {"active": ""}})
+
+
+async def obter(job_id: str) -> dict | None:
+    return await db.scrape_jobs.find_one({"_id": job_id}, {"active": 0})
+
+
+def shutdown():
+    if _executor is None:
+        return
+    # shutdown() sozinho não interrompe o Selenium: o worker recebe SIGTERM
+    # e fecha os navegadores antes de sair
+    processos = list((_executor._processes or {}).values())
+    _executor.shutdown(wait=False, cancel_futures=True)
+    for proc in processos:
+        proc.terminate()
+    for proc in processos:
+        proc.join(SHUTDOWN_SECONDS)
+        if proc.is_alive():
+            proc.kill()
+
+
+async def ensure_indexes():
+    await db.scrape_jobs.create_index(
+        "active", unique=True, partialFilterExpression={"active": True})
@@ -1,6 +1,12 @@
 # scraper_clubinho.py
 
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from html.parser import HTMLParser
+from urllib.parse import urljoin
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
@@ -10,6 +16,8 @@ from selenium.common.exceptions import TimeoutException
 import re
 
 BASE_URL = "https://clubinhodeofertas.com.br/sao-paulo/busca?genres="
+# Navegadores abertos ao mesmo tempo (uma categoria por navegador)
+POOL_SIZE = int(os.environ.get("SCRAPER_POOL_SIZE", 4))
 
 CATEGORIES = [
     "Teatro Infantil", "Parques", "Musical Infantil", "Teatro adulto",
@@ -67,22 +75,117 @@ def parse_days(days_text: str):
     return min(dates), max(dates)
 
 
-def scrape_category(driver, category: str):
-    url = BASE_URL + category.replace(" ", "%20")
-    driver.get(url)
-
-    events = []
-    try:
-        cards_xpath = "//a[@class='product-thumb']"
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_all_elements_located((By.XPATH, cards_xpath))
-        )
-        cards = driver.find_elements(By.XPATH, cards_xpath)
-
-    except TimeoutException:
-        print(f"Nenhum evento encontrado para a categoria '{category}'")
-        return []
-
+class ProductThumbParser(HTMLParser):
+    """
+    Extrai os cards `<a class="product-thumb">` de uma página já carregada,
+    sem uma ida ao navegador por campo.
+
+    Como o navegador, tolera tags sem fechamento: um card termina no `</a>`
+    dele (ou quando outro `<a>` começa) e fechar um elemento fecha também os
+    filhos que ficaram abertos.
+    """
+
+    FIELDS = {
+        "product-thumb__title": "name",
+        "product-thumb__venue": "venue",
+        "product-thumb__days": "days",
+    }
+    VOID = {"area", "base", "br", "col", "embed", "hr", "img", "input",
+            "link", "meta", "param", "source", "track", "wbr"}
+    # Elementos que fecham um `<p>` aberto ao começar
+    CLOSE_P = {"address", "article", "aside", "blockquote", "div", "footer",
+               "h1", "h2", "h3", "h4", "h5", "h6", "header", "li", "ol",
+               "p", "section", "table", "ul"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.cards = []
+        self.card = None
+        # Elementos abertos dentro do card atual
+        self.stack = []
+        self.field = None
+        self.field_level = 0
+
+    def _close_to(self, tag):
+        """Fecha o `tag` aberto mais interno e tudo o que ficou aberto dentro dele."""
+        level = len(self.stack) - 1 - self.stack[::-1].index(tag)
+        del self.stack[level:]
+        if self.field is not None and len(self.stack) < self.field_level:
+            self.field = None
+
+    def _end_card(self):
+        card = self.card
+        for key in ("name", "venue", "days"):
+            # Como o `.text` do Selenium: espaços normalizados, None se vazio
+            card[key] = " ".join(" ".join(card[key]).split()) or None
+        self.cards.append(card)
+        self.card = None
+        self.stack = []
+        self.field = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "a" and self.card is not None:
+            # `<a>` não aninha: o navegador fecha o card aberto
+            self._end_card()
+        if self.card is None:
+            # Mesmo critério do XPath: class exatamente "product-thumb"
+            if tag == "a" and attrs.get("class") == "product-thumb":
+                self.card = {"name": [], "venue": [], "days": [],
+                             "link": attrs.get("href"), "image": None}
+            return
+
+        if tag == "img" and self.card["image"] is None:
+            self.card["image"] = attrs.get("src")
+        if tag in self.VOID:
+            return
+        if tag in self.CLOSE_P and "p" in self.stack:
+            self._close_to("p")
+        if tag == "li" and "li" in self.stack:
+            self._close_to("li")
+        self.stack.append(tag)
+        if self.field is None:
+            for cls in (attrs.get("class") or "").split():
+                if cls in self.FIELDS:
+                    self.field = self.FIELDS[cls]
+                    self.field_level = len(self.stack)
+                    break
+
+    def handle_endtag(self, tag):
+        if self.card is None:
+            return
+        if tag == "a":
+            self._end_card()
+        elif tag in self.stack:
+            self._close_to(tag)
+        # Fechamento sem abertura correspondente é ignorado
+
+    def handle_data(self, data):
+        if self.card is not None and self.field is not None:
+            self.card[self.field].append(data)
+
+    def close(self):
+        super().close()
+        if self.card is not None:
+            self._end_card()
+
+
+def parse_cards(html: str, base_url: str = BASE_URL) -> list[dict]:
+    """Cards da página como {name, link, image, venue, days}, com URLs absolutas."""
+    parser = ProductThumbParser()
+    parser.feed(html)
+    parser.close()
+    for card in parser.cards:
+        if card["link"]:
+            card["link"] = urljoin(base_url, card["link"])
+        if card["image"]:
+            card["image"] = urljoin(base_url, card["image"])
+    return parser.cards
+
+
+def _cards_via_selenium(cards) -> list[dict]:
+    """Caminho antigo, campo a campo no navegador (usado se o parse falhar)."""
+    result = []
     for card in cards:
         try:
             name = card.find_element(
@@ -111,54 +214,118 @@ def scrape_category(driver, category: str):
         except:
             days = None
 
-        start_date, end_date = parse_days(days)
-
-        event_doc = {
-            "name": name,
-            "detail": None,
-            "start_date": start_date,
-            "end_date": end_date,
-            "private_event": 0,
-            "published": 1,
-            "cancelled": 0,
-            "image": image,
-            "url": link,
-            "address": {
-                "name": venue,
-                "address": None,
-                "address_num": None,
-                "address_alt": None,
-                "neighborhood": None,
-                "city": None,
-                "state": None,
-                "zip_code": None,
-                "country": None,
-                "lon": None,
-                "lat": None,
-            },
-            "host": {"name": None, "description": None},
-            "category_prim": {"name": category},
-            "category_sec": None,
-            "organizer_id": None,  # preenchido pela API
-            "created_at": datetime.utcnow(),
-        }
-
-        events.append(event_doc)
-
-    return events
-
-
-def scrape_all():
-    driver = start_driver()
-    all_events = []
+        result.append({"name": name, "link": link, "image": image,
+                       "venue": venue, "days": days})
+    return result
+
+
+def build_event(category: str, card: dict) -> dict:
+    start_date, end_date = parse_days(card["days"])
+
+    return {
+        "name": card["name"],
+        "detail": None,
+        "start_date": start_date,
+        "end_date": end_date,
+        "private_event": 0,
+        "published": 1,
+        "cancelled": 0,
+        "image": card["image"],
+        "url": card["link"],
+        "address": {
+            "name": card["venue"],
+            "address": None,
+            "address_num": None,
+            "address_alt": None,
+            "neighborhood": None,
+            "city": None,
+            "state": None,
+            "zip_code": None,
+            "country": None,
+            "lon": None,
+            "lat": None,
+        },
+        "host": {"name": None, "description": None},
+        "category_prim": {"name": category},
+        "category_sec": None,
+        "organizer_id": None,  # preenchido pela API
+        "created_at": datetime.utcnow(),
+    }
+
+
+def scrape_category(driver, category: str):
+    url = BASE_URL + category.replace(" ", "%20")
+    driver.get(url)
+
     try:
-        for cat in CATEGORIES:
+        cards_xpath = "//a[@class='product-thumb']"
+        elements = WebDriverWait(driver, 10).until(
+            EC.presence_of_all_elements_located((By.XPATH, cards_xpath))
+        )
+    except TimeoutException:
+        print(f"Nenhum evento encontrado para a categoria '{category}'")
+        return []
+
+    # Caminho rápido: uma leitura do HTML e parse local
+    cards = parse_cards(driver.page_source, driver.current_url)
+    if len(cards) < len(elements):
+        # O parse local perdeu cards que o navegador encontrou
+        cards = _cards_via_selenium(driver.find_elements(By.XPATH, cards_xpath))
+
+    return [build_event(category, card) for card in cards]
+
+
+def scrape_all(on_category=None, pool_size: int = POOL_SIZE):
+    """
+    Coleta todas as categorias em paralelo, com até `pool_size` navegadores.
+    `on_category(categoria, total, erro)` é chamado ao fim de cada uma
+    (usado para reportar o progresso do job).
+    """
+    pool_size = max(1, min(pool_size, len(CATEGORIES)))
+    drivers = queue.Queue()
+    created = []
+    lock = threading.Lock()
+
+    def run(cat):
+        driver = None
+        try:
+            try:
+                driver = drivers.get_nowait()
+            except queue.Empty:
+                driver = start_driver()
+                with lock:
+                    created.append(driver)
             events_from_category = scrape_category(driver, cat)
-            print(
-                f"Categoria '{cat}' → {len(events_from_category)} eventos coletados")
-            all_events.extend(events_from_category)
+        except Exception as exc:
+            # Uma categoria com erro não interrompe as demais; o navegador
+            # pode ter ficado em estado ruim, então é descartado
+            print(f"Erro na categoria '{cat}': {exc}")
+            if driver is not None:
+                with lock:
+                    created.remove(driver)
+                try:
+                    driver.quit()
+                except Exception:
+                    pass
+            if on_category:
+                on_category(cat, 0, str(exc))
+            return []
+        drivers.put(driver)
+        print(
+            f"Categoria '{cat}' → {len(events_from_category)} eventos coletados")
+        if on_category:
+            on_category(cat, len(events_from_category), None)
+        return events_from_category
+
+    all_events = []
+    try:
+        with ThreadPoolExecutor(max_workers=pool_size) as executor:
+            # map mantém a ordem das categorias no resultado
+            for events_from_category in executor.map(run, CATEGORIES):
+                all_events.extend(events_from_category)
     finally:
-        driver.quit()
+        for driver in created:
+            driver.quit()
 
     # Remove duplicatas baseadas na URL do evento
     unique_events = {event['url']: event for event in all_events}.values()
@@ -0,0 +1,97 @@
+import heapq
+import os
+import time
+from collections import Counter
+from bson import ObjectId
+from app.database import db
+
+# Peso de cada sinal no ranking de sugestões
+PESO_AMIGO_EM_COMUM = 2.0
+PESO_EVENTO_EM_COMUM = 1.0
+MAX_EVENTOS_CONSIDERADOS = 200
+REFRESH_SECONDS = float(os.environ.get("SOCIAL_GRAPH_REFRESH_SECONDS", 600))
+
+
+class SocialGraph:
+    """
+    Índice de adjacência da rede de amizades (id -> conjunto de ids).
+
+    Carregado do campo `users.friends` uma vez e atualizado incrementalmente
+    em `add_friend`; uma recarga completa periódica alinha os workers.
+    """
+
+    def __init__(self):
+        self.adjacency: dict[str, set[str]] = {}
+        self.loaded_at = 0.0
+
+    async def ensure_loaded(self):
+        if time.monotonic() - self.loaded_at < REFRESH_SECONDS:
+            return
+        adjacency = {}
+        async for user in db.users.find({}, {"friends": 1}):
+            adjacency[str(user["_id"])] = set(user.get("friends", []))
+        self.adjacency = adjacency
+        self.loaded_at = time.monotonic()
+
+    def add_edge(self, a: str, b: str):
+        self.adjacency.setdefault(a, set()).add(b)
+        self.adjacency.setdefault(b, set()).add(a)
+
+    def friends_of(self, user_id: str) -> set[str]:
+        return self.adjacency.get(user_id, set())
+
+    def mutual_counts(self, user_id: str) -> Counter:
+        """Amigos de amigos (profundidade 2) com o número de amigos em comum."""
+        counts = Counter()
+        for friend in self.friends_of(user_id):
+            counts.update(self.friends_of(friend))
+        return counts
+
+
+social_graph = SocialGraph()
+
+
+async def _eventos_em_comum(user_id: ObjectId) -> Counter:
+    """Quantos eventos confirmados cada outro usuário tem em comum com o usuário."""
+    event_ids = [p["event_id"] async for p in db.event_participants.find(
+        {"user_id": user_id, "status": "confirmed"}, {"event_id": 1}
+    ).sort("created_at", -1).limit(MAX_EVENTOS_CONSIDERADOS)]
+    if not event_ids:
+        return Counter()
+
+    counts = Counter()
+    async for doc in db.event_participants.aggregate([
+        {"$match": {"event_id": {"$in": event_ids}, "status": "confirmed",
+                    "user_id": {"$ne": user_id}}},
+        {"$group": {"_id": "$user_id", "count": {"$sum": 1}}},
+    ]):
+        counts[str(doc["_id"])] = doc["count"]
+    return counts
+
+
+async def sugerir_amigos(user_id: str, limit: int = 10) -> list[dict]:
+    await social_graph.ensure_loaded()
+
+    mutual = social_graph.mutual_counts(user_id)
+    shared = await _eventos_em_comum(ObjectId(user_id))
+
+    excluded = social_graph.friends_of(user_id) | {user_id}
+    candidates = (set(mutual) | set(shared)) - excluded
+    top = heapq.nlargest(
+        limit, candidates,
+        key=lambda c: PESO_AMIGO_EM_COMUM * mutual[c] + PESO_EVENTO_EM_COMUM * shared[c]
+    )
+    if not top:
+        return []
+
+    names = {}
+    async for u in db.users.find({"_id": {"$in": [ObjectId(c) for c in top]}}, {"name": 1}):
+        names[str(u["_id"])] = u.get("name")
+
+    return [{
+        "id": c,
+        "name": names.get(c),
+        "amigos_em_comum": mutual[c],
+        "eventos_em_comum": shared[c],
+        "score": PESO_AMIGO_EM_COMUM * mutual[c] + PESO_EVENTO_EM_COMUM * shared[c]
+    } for c in top if c in names]
@@ -0,0 +1,112 @@
+import os
+import time
+from datetime import datetime
+from pymongo import UpdateOne, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from app.database import db
+
+# Tags criadas na primeira inicialização (coleção vazia)
+DEFAULT_TAGS = [
+    "Aventura",
+    "Aquático",
+    "Recreação/Lazer",
+    "Cultural",
+    "Show",
+    "Musical",
+    "Teatro",
+    "Educativo/Científico",
+    "Ar Livre",
+    "Parque Temático",
+    "Indoor/Fechado",
+    "Day Use/Passeio",
+    "Familiar",
+    "Infantil/Crianças",
+    "Esportivo",
+    "Gastronômico",
+    "Oficina/Workshop",
+    "Tecnologia",
+    "Artes",
+    "Dança",
+    "Literatura",
+    "Compras",
+    "Feira",
+    "Festa",
+    "Noturno",
+]
+
+# De quanto em quanto tempo o worker confere se a versão mudou
+CHECK_SECONDS = float(os.environ.get("TAG_REGISTRY_CHECK_SECONDS", 5))
+VERSION_ID = "tags"
+
+
+class TagRegistry:
+    """
+    Cadastro de tags no Mongo (`tags`) com uma cópia imutável em memória.
+
+    Cada alteração incrementa a versão em `registry_versions`; os workers
+    só conferem esse número (uma leitura por `_id`) a cada CHECK_SECONDS e
+    recarregam a lista quando ele muda.
+    """
+
+    def __init__(self):
+        self.tags: frozenset[str] = frozenset()
+        self.ordered: tuple[str, ...] = ()
+        self.version = -1
+        self.checked_at = 0.0
+
+    async def seed(self):
+        now = datetime.utcnow()
+        result = await db.tags.bulk_write([
+            UpdateOne({"_id": tag}, {"$setOnInsert": {"order": i, "created_at": now}}, upsert=True)
+            for i, tag in enumerate(DEFAULT_TAGS)
+        ], ordered=False)
+        if result.upserted_count:
+            await self._bump_version()
+        await self.refresh(force=True)
+
+    async def _bump_version(self) -> int:
+        doc = await db.registry_versions.find_one_and_update(
+            {"_id": VERSION_ID}, {"$inc": {"version": 1}},
+            upsert=True, return_document=ReturnDocument.AFTER)
+        return doc["version"]
+
+    async def refresh(self, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self.checked_at < CHECK_SECONDS:
+            return
+        self.checked_at = now
+        doc = await db.registry_versions.find_one({"_id": VERSION_ID}, {"version": 1})
+        version = doc["version"] if doc else 0
+        if version == self.version and not force:
+            return
+
+        ordered = tuple([t["_id"] async for t in db.tags.find({}, {"_id": 1}).sort([("order", 1), ("_id", 1)])])
+        self.ordered = ordered
+        self.tags = frozenset(ordered)
+        self.version = version
+
+    async def atual(self) -> frozenset[str]:
+        await self.refresh()
+        return self.tags
+
+    async def listar(self) -> list[str]:
+        await self.refresh()
+        return list(self.ordered)
+
+    async def invalidas(self, tags: list[str]) -> list[str]:
+        validas = await self.atual()
+        return [t for t in tags if t not in validas]
+
+    async def adicionar(self, tag: str) -> bool:
+        """Cadastra a tag; retorna False se ela já existe."""
+        try:
+            await db.tags.insert_one({
+                "_id": tag, "order": len(self.ordered), "created_at": datetime.utcnow()})
+        except DuplicateKeyError:
+            return False
+        await self._bump_version()
+        await self.refresh(force=True)
+        return True
+
+
+tag_registry = TagRegistry()
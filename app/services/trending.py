@@ -0,0 +1,169 @@
+import asyncio
+import calendar
+import logging
+import math
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import UpdateOne, ReplaceOne
+from app.database import db
+
+# Tamanho de cada bucket de atividade e janela considerada no trending
+BUCKET_SECONDS = 3600
+WINDOW_DAYS = int(os.environ.get("TRENDING_WINDOW_DAYS", 14))
+HALF_LIFE_HOURS = float(os.environ.get("TRENDING_HALF_LIFE_HOURS", 72))
+REFRESH_SECONDS = float(os.environ.get("TRENDING_REFRESH_SECONDS", 300))
+# A cada quantos refreshes o total de likes é recontado do zero
+FULL_LIKES_EVERY = int(os.environ.get("TRENDING_FULL_LIKES_EVERY", 12))
+
+# Peso de cada tipo de atividade no score
+WEIGHTS = {
+    "likes": 1.0,
+    "participations": 3.0,
+    "tag_votes": 0.5,
+}
+
+DECAY = math.log(2) / HALF_LIFE_HOURS
+
+logger = logging.getLogger(__name__)
+
+# Início do último refresh e quantos foram incrementais desde a recontagem
+_likes_state = {"since": None, "incrementais": 0}
+
+
+def bucket_start(dt: datetime) -> datetime:
+    """Arredonda a data (UTC, sem fuso) para o início do bucket (hora cheia)."""
+    ts = calendar.timegm(dt.utctimetuple()) // BUCKET_SECONDS * BUCKET_SECONDS
+    return datetime.utcfromtimestamp(ts)
+
+
+def _bucket_update(event_id: ObjectId, kind: str, amount: int, now: datetime) -> UpdateOne:
+    return UpdateOne(
+        {"event_id": event_id, "bucket": bucket_start(now)},
+        {"$inc": {kind: amount}},
+        upsert=True
+    )
+
+
+async def record_activity(event_id, kind: str, amount: int = 1):
+    """Incrementa o contador do bucket atual (likes, participations ou tag_votes)."""
+    await record_activity_many([event_id], kind, amount)
+
+
+async def record_activity_many(event_ids, kind: str, amount: int = 1):
+    if kind not in WEIGHTS:
+        raise ValueError(f"Atividade desconhecida: {kind}")
+    if not event_ids:
+        return
+    now = datetime.utcnow()
+    await db.event_activity_buckets.bulk_write(
+        [_bucket_update(ObjectId(eid), kind, amount, now) for eid in event_ids],
+        ordered=False
+    )
+
+
+async def _contar_likes(match: dict) -> dict:
+    return {r["_id"]: r["likes"] async for r in db.event_reactions.aggregate([
+        {"$match": {**match, "reaction": "like"}},
+        {"$group": {"_id": "$event_id", "likes": {"$sum": 1}}}
+    ])}
+
+
+async def _total_likes() -> dict:
+    """
+    Likes de todos os tempos por evento. Parte do total já materializado em
+    `trending_events` e só reconta os eventos com reações gravadas desde o
+    refresh anterior; a cada FULL_LIKES_EVERY refreshes reconta tudo.
+    """
+    since = _likes_state["since"]
+    if since is None or _likes_state["incrementais"] >= FULL_LIKES_EVERY:
+        return await _contar_likes({})
+
+    total = {t["_id"]: t["likes"] async for t in db.trending_events.find(
+        {"likes": {"$gt": 0}}, {"likes": 1})}
+    # Sobreposição de um intervalo cobre reações que esperaram no buffer
+    alterados = await db.event_reactions.distinct(
+        "event_id", {"created_at": {"$gte": since - timedelta(seconds=REFRESH_SECONDS)}})
+    if alterados:
+        recontados = await _contar_likes({"event_id": {"$in": alterados}})
+        for event_id in alterados:
+            total[event_id] = recontados.get(event_id, 0)
+    return total
+
+
+async def refresh_trending() -> int:
+    """
+    Recalcula a coleção materializada `trending_events`.
+
+    O score soma as atividades de cada bucket da janela com decaimento
+    exponencial pela idade do bucket. O total de likes de todos os tempos
+    também é materializado para servir o `/stats/top-liked` (ver `_total_likes`).
+    """
+    now = datetime.utcnow()
+    since = now - timedelta(days=WINDOW_DAYS)
+
+    scores = defaultdict(float)
+    recent = defaultdict(lambda: dict.fromkeys(WEIGHTS, 0))
+    async for b in db.event_activity_buckets.find({"bucket": {"$gte": since}}):
+        age_hours = (now - b["bucket"]).total_seconds() / 3600
+        decay = math.exp(-DECAY * age_hours)
+        for kind, weight in WEIGHTS.items():
+            count = b.get(kind, 0)
+            scores[b["event_id"]] += weight * count * decay
+            recent[b["event_id"]][kind] += count
+
+    total_likes = await _total_likes()
+
+    event_ids = set(scores) | set(total_likes)
+    ops = []
+    async for ev in db.events.find(
+        {"_id": {"$in": list(event_ids)}},
+        {"name": 1, "tags": 1, "image": 1, "start_date": 1, "address": 1}
+    ):
+        address = ev.get("address") or {}
+        ops.append(ReplaceOne({"_id": ev["_id"]}, {
+            "name": ev.get("name"),
+            "tags": ev.get("tags", []),
+            "image": ev.get("image"),
+            "start_date": ev.get("start_date"),
+            "address": ev.get("address"),
+            "city": address.get("city"),
+            "score": round(scores.get(ev["_id"], 0.0), 4),
+            "likes": total_likes.get(ev["_id"], 0),
+            "recent": recent.get(ev["_id"], dict.fromkeys(WEIGHTS, 0)),
+            "refreshed_at": now,
+        }, upsert=True))
+
+    if ops:
+        await db.trending_events.bulk_write(ops, ordered=False)
+    # Remove eventos que saíram do ranking (ou foram apagados)
+    await db.trending_events.delete_many({"refreshed_at": {"$lt": now}})
+    # Só avança depois de materializar, para um refresh com erro não perder reações
+    completo = _likes_state["since"] is None or _likes_state["incrementais"] >= FULL_LIKES_EVERY
+    _likes_state.update(since=now, incrementais=0 if completo else _likes_state["incrementais"] + 1)
+    return len(ops)
+
+
+async def run_refresh_loop():
+    while True:
+        try:
+            await refresh_trending()
+        except Exception:
+            logger.exception("Erro ao atualizar trending")
+        await asyncio.sleep(REFRESH_SECONDS)
+
+
+async def ensure_indexes():
+    await db.event_activity_buckets.create_index(
+        [("event_id", 1), ("bucket", 1)], unique=True)
+    # Buckets fora da janela expiram sozinhos
+    await db.event_activity_buckets.create_index(
+        "bucket", expireAfterSeconds=(WINDOW_DAYS + 1) * 86400)
+    # Recontagem incremental dos likes
+    await db.event_reactions.create_index("created_at")
+    await db.event_reactions.create_index([("event_id", 1), ("reaction", 1)])
+    await db.trending_events.create_index([("score", -1)])
+    await db.trending_events.create_index([("likes", -1)])
+    await db.trending_events.create_index([("tags", 1), ("score", -1)])
+    await db.trending_events.create_index([("city", 1), ("score", -1)])
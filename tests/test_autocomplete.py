@@ -0,0 +1,52 @@
+from app.services.autocomplete import IndiceAutocomplete
+
+
+class TestIndiceAutocomplete:
+    def _indice(self):
+        indice = IndiceAutocomplete()
+        indice.adicionar({"_id": "1", "name": "Teatro de Bonecos",
+                          "address": {"name": "Parque Aquático Municipal"},
+                          "participant_counts": {"confirmed": 3}})
+        indice.adicionar({"_id": "2", "name": "Teatro Musical",
+                          "participant_counts": {"confirmed": 10}})
+        indice.adicionar({"_id": "3", "name": "Oficina no Parque",
+                          "address": {"name": "Parque Aquático Municipal"}})
+        return indice
+
+    def test_prefixo_sem_acento(self):
+        """Test accent-insensitive prefix match ordered by popularity"""
+        indice = self._indice()
+
+        assert [s["texto"] for s in indice.sugerir("teatr")] == ["Teatro Musical", "Teatro de Bonecos"]
+        assert indice.sugerir("parque aqua")[0] == {
+            "texto": "Parque Aquático Municipal", "tipo": "local", "event_id": None}
+        assert indice.sugerir("t") == []
+
+    def test_remocao(self):
+        """Test removed events and empty venues stop being suggested"""
+        indice = self._indice()
+
+        indice.remover("2")
+        assert [s["event_id"] for s in indice.sugerir("teatro")] == ["1"]
+
+        indice.remover("1")
+        indice.remover("3")
+        assert indice.sugerir("parque") == []
+
+    def test_prefixo_comum_em_ordem_de_popularidade(self):
+        """Test common prefixes walk the popularity-ordered list and stay fresh after writes"""
+        from app.services import autocomplete
+        indice = IndiceAutocomplete()
+        for i in range(autocomplete.FAIXA_PEQUENA + 100):
+            indice.adicionar({"_id": str(i), "name": f"Teatro {i}",
+                              "participant_counts": {"confirmed": i % 50}})
+
+        primeiros = indice.sugerir("te", limit=3)
+        assert all(s["texto"].startswith("Teatro") for s in primeiros)
+        assert len(primeiros) == 3
+
+        indice.adicionar({"_id": "novo", "name": "Teatro Novo",
+                          "participant_counts": {"confirmed": 1000}})
+        assert indice.sugerir("tea", limit=1)[0]["event_id"] == "novo"
+        indice.remover("novo")
+        assert indice.sugerir("teatro novo") == []
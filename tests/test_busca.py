@@ -0,0 +1,128 @@
+import asyncio
+from datetime import datetime
+from app.services.busca import IndiceBusca
+
+
+class TestIndiceBusca:
+    def _indice(self):
+        indice = IndiceBusca()
+        indice.adicionar({"_id": "1", "name": "Show de mágica", "tags": ["Show"],
+                          "detail": "Mágico com truques para crianças",
+                          "start_date": datetime(2026, 5, 1)})
+        indice.adicionar({"_id": "2", "name": "Oficina de robótica", "tags": ["Tecnologia"],
+                          "category_prim": {"name": "Educativo"},
+                          "detail": "Robôs e programação para crianças",
+                          "start_date": datetime(2026, 6, 1)})
+        indice.adicionar({"_id": "3", "name": "Teatro infantil", "tags": ["Teatro"],
+                          "detail": "Peça com mágica e música",
+                          "start_date": datetime(2026, 7, 1)})
+        return indice
+
+    def test_ranking_bm25(self):
+        """Test events matching in the name rank first"""
+        indice = self._indice()
+
+        ids = [event_id for event_id, _ in indice.buscar("mágica")]
+        assert ids == ["1", "3"]
+        assert indice.buscar("robótica")[0][0] == "2"
+        assert indice.buscar("de para com") == []
+
+    def test_filtros(self):
+        """Test tag and date filters"""
+        indice = self._indice()
+
+        assert [e for e, _ in indice.buscar("crianças", tag="Tecnologia")] == ["2"]
+        assert [e for e, _ in indice.buscar("mágica", data_inicio=datetime(2026, 6, 15))] == ["3"]
+
+    def test_atualizacao_incremental(self):
+        """Test removing and re-adding events updates the index"""
+        indice = self._indice()
+
+        indice.remover("1")
+        assert [e for e, _ in indice.buscar("mágica")] == ["3"]
+        assert indice.df["show"] == 0
+
+        indice.adicionar({"_id": "3", "name": "Teatro de bonecos", "tags": ["Teatro"]})
+        assert indice.buscar("mágica") == []
+        assert indice.total == 2
+
+    def test_compactacao(self):
+        """Test the index compacts itself once too many slots are dead"""
+        indice = IndiceBusca()
+        for i in range(3000):
+            indice.adicionar({"_id": str(i), "name": f"Evento {'par' if i % 2 else 'impar'}",
+                              "tags": ["Show"] if i % 3 == 0 else []})
+        for i in range(0, 3000, 2):
+            indice.remover(str(i))
+
+        assert len(indice.ids) < 3000
+        assert indice.mortos < len(indice.ids) * 0.25 + 1
+        resultado = indice.buscar("par", limit=5000)
+        assert len(resultado) == 1500
+        assert all(int(e) % 2 == 1 for e, _ in resultado)
+        assert [e for e, _ in indice.buscar("par", limit=3, tag="Show")] == ["3", "9", "15"]
+        assert indice.buscar("impar") == []
+
+    def test_datas_sem_fuso_em_utc(self):
+        """Test naive datetimes are treated as UTC"""
+        from app.services.busca import _timestamp
+        assert _timestamp(datetime(2026, 1, 1)) == 1767225600.0
+        assert _timestamp("2026-01-01T00:00:00") == 1767225600.0
+
+    def test_remocao_em_lote(self):
+        """Test batch removal through the catalog hook"""
+        indice = self._indice()
+        indice.aplicar(indice.version + 1, inseridos=(), removidos=["1", "3", "99"], limpar=False)
+
+        assert indice.buscar("mágica") == []
+        assert indice.total == 1
+        assert indice.df["mágica"] == 0 and indice.df["crianças"] == 1
+
+    def test_versoes_de_outro_worker(self, monkeypatch):
+        """Test catalog versions from other workers reload only the changed events"""
+        from app.services import alteracoes, catalogo
+
+        async def cenario(entradas):
+            indice = self._indice()
+            indice.version = 3
+            recarregados, reconstrucoes = [], []
+
+            async def versao():
+                return 3 + len(entradas)
+
+            async def ler(log_id, desde, ate):
+                return entradas
+
+            async def recarregar(ids):
+                recarregados.extend(ids)
+
+            async def construir():
+                reconstrucoes.append(True)
+
+            monkeypatch.setattr(catalogo, "versao", versao)
+            monkeypatch.setattr(alteracoes, "ler", ler)
+            monkeypatch.setattr(indice, "_recarregar", recarregar)
+            monkeypatch.setattr(indice, "construir", construir)
+            await indice.ensure_current()
+            if indice._rebuild is not None:
+                await indice._rebuild
+            return indice, recarregados, reconstrucoes
+
+        indice, recarregados, reconstrucoes = asyncio.run(cenario([
+            {"version": 4, "dados": {"ids": ["1", "2"], "reconstruir": False}},
+            {"version": 5, "dados": {"ids": ["2"], "reconstruir": False}},
+        ]))
+        assert recarregados == ["1", "2"] and not reconstrucoes
+        assert indice.version == 5
+
+        _, recarregados, reconstrucoes = asyncio.run(cenario([
+            {"version": 4, "dados": {"ids": [], "reconstruir": True}},
+        ]))
+        assert recarregados == [] and reconstrucoes == [True]
+
+    def test_dados_alteracao(self):
+        """Test large writes ask for a full rebuild instead of a huge id list"""
+        from app.services import catalogo
+        assert catalogo.dados_alteracao(["1", "1", "2"]) == {"ids": ["1", "2"], "reconstruir": False}
+        muitos = [str(i) for i in range(catalogo.MAX_INCREMENTAL + 1)]
+        assert catalogo.dados_alteracao(muitos) == {"ids": [], "reconstruir": True}
@@ -0,0 +1,31 @@
+from app.services.gamificacao import GamificacaoService
+
+
+class TestGamificacaoRegras:
+    def test_calcular_nivel_limites(self):
+        """Test level thresholds with binary search"""
+        service = GamificacaoService()
+
+        assert service.calcular_nivel(99) == 1
+        assert service.calcular_nivel(2700) == 10
+        assert service.calcular_nivel(10450) == 20
+        assert service.calcular_nivel(999999) == 20
+
+    def test_xp_por_acao(self):
+        """Test XP awarded per action"""
+        service = GamificacaoService()
+
+        for acao in ["like", "participacao", "voto_tags", "amizade"]:
+            assert service.XP_POR_ACAO[acao] > 0
+
+    def test_regras_badges(self):
+        """Test every badge has a declarative rule over a known counter"""
+        service = GamificacaoService()
+
+        for badge_id, badge_data in service.BADGES.items():
+            regra = badge_data["regra"]
+            assert regra["contador"] in service.CONTADORES
+            assert regra["minimo"] >= 1
+            assert badge_id in service.regras_para(regra["contador"])
+
+        assert set(service.regras_para("like")) == {"primeiro_evento", "explorador", "veterano"}
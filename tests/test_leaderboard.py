@@ -0,0 +1,48 @@
+from app.services.leaderboard import FenwickTree, Leaderboard
+
+
+class TestLeaderboard:
+    def test_fenwick_prefix(self):
+        """Test Fenwick tree prefix sums"""
+        tree = FenwickTree(16)
+        tree.add(0, 2)
+        tree.add(5, 1)
+        tree.add(10, 3)
+
+        assert tree.prefix(0) == 2
+        assert tree.prefix(4) == 2
+        assert tree.prefix(5) == 3
+        assert tree.prefix(15) == 6
+
+    def test_posicao_para_xp(self):
+        """Test rank lookup with ties sharing a position"""
+        ranking = Leaderboard()
+        for xp in [0, 100, 100, 250, 700]:
+            ranking.registrar_xp(None, xp)
+
+        assert ranking.posicao_para_xp(700) == 1
+        assert ranking.posicao_para_xp(250) == 2
+        assert ranking.posicao_para_xp(100) == 3
+        assert ranking.posicao_para_xp(0) == 5
+
+        # usuário sobe de 0 para 300 XP
+        ranking.registrar_xp(0, 300)
+        assert ranking.posicao_para_xp(300) == 2
+        assert ranking.posicao_para_xp(100) == 4
+
+    def test_cresce_para_xp_alto(self):
+        """Test tree grows for XP beyond its size"""
+        ranking = Leaderboard()
+        ranking.registrar_xp(None, 10)
+        ranking.registrar_xp(None, 50000)
+
+        assert ranking.posicao_para_xp(50000) == 1
+        assert ranking.posicao_para_xp(10) == 2
+
+    def test_classificar_empates(self):
+        """Test tied XP shares the same position in list rankings"""
+        from app.services.leaderboard import classificar
+        ranking = classificar([("a", {"name": "A"}, 50), ("b", {}, 50), ("c", {"level": 2}, 10)])
+
+        assert [r["posicao"] for r in ranking] == [1, 1, 3]
+        assert ranking[2] == {"usuario_id": "c", "nome": "", "xp": 10, "nivel": 2, "posicao": 3}
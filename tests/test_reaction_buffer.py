@@ -0,0 +1,24 @@
+import asyncio
+import pytest
+from app.services.reaction_buffer import ReactionBuffer, BufferCheio
+
+
+class TestReactionBuffer:
+    def test_buffer_cheio_rejeita_novas_chaves(self):
+        """Test a full buffer applies backpressure instead of flushing inline"""
+        async def cenario():
+            buffer = ReactionBuffer()
+            buffer.max_size = 2
+            await buffer.add("u1", "e1", "like")
+            await buffer.add("u1", "e2", "like")
+            # a mesma chave só é sobrescrita, sem crescer o buffer
+            await buffer.add("u1", "e1", "dislike")
+            with pytest.raises(BufferCheio):
+                await buffer.add("u2", "e1", "like")
+            return buffer
+
+        buffer = asyncio.run(cenario())
+        assert len(buffer._pending) == 2
+        assert buffer._pending[("u1", "e1")][0] == "dislike"
+        assert buffer.rejected == 1
+        assert buffer._wake.is_set()
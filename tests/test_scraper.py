@@ -0,0 +1,80 @@
+import os
+import pytest
+
+
+class TestParseCards:
+    CARDS_HTML = """
+    <div class="columns">
+      <a class="product-thumb" href="/sao-paulo/evento/circo-magico">
+        <img src="https://cdn.example.com/circo.jpg">
+        <div class="product-thumb__content">
+          <h3 class="product-thumb__title"> Circo   Mágico &amp; Cia </h3>
+          <p class="product-thumb__venue">Teatro <b>Frei Caneca</b></p>
+          <span class="product-thumb__days">Dias 04/10, 11/10</span>
+        </div>
+      </a>
+      <a class="product-thumb" href="https://clubinhodeofertas.com.br/outro">
+        <h3 class="product-thumb__title">Sem local</h3>
+      </a>
+      <a class="product-thumb featured" href="/ignorado"></a>
+    </div>
+    """
+
+    def test_extrai_cards(self):
+        """Test product-thumb cards are parsed offline like the Selenium path"""
+        scraper = pytest.importorskip("app.services.scraper_clubinho")
+        cards = scraper.parse_cards(self.CARDS_HTML)
+
+        assert len(cards) == 2
+        assert cards[0] == {
+            "name": "Circo Mágico & Cia",
+            "venue": "Teatro Frei Caneca",
+            "days": "Dias 04/10, 11/10",
+            "link": "https://clubinhodeofertas.com.br/sao-paulo/evento/circo-magico",
+            "image": "https://cdn.example.com/circo.jpg",
+        }
+        assert cards[1]["venue"] is None and cards[1]["image"] is None
+
+        event = scraper.build_event("Circo", cards[0])
+        assert event["address"]["name"] == "Teatro Frei Caneca"
+        assert event["category_prim"] == {"name": "Circo"}
+
+    def test_tags_sem_fechamento(self):
+        """Test unclosed tags inside a card do not swallow the following cards"""
+        scraper = pytest.importorskip("app.services.scraper_clubinho")
+        html = """
+        <a class="product-thumb" href="/1"><h3 class="product-thumb__title">OK</h3></a>
+        <a class="product-thumb" href="/2"><h3 class="product-thumb__title">Dois</h3>
+          <p class="product-thumb__venue">V<br></a>
+        <a class="product-thumb" href="/3"><ul><li class="product-thumb__title">Três
+          <li>ignorado</ul><embed src="x"><p class="product-thumb__days">Dias 27
+          <div>fora</div></a>
+        <a class="product-thumb" href="/4"><h3 class="product-thumb__title">Quatro</h3>
+        """
+        cards = scraper.parse_cards(html)
+
+        assert [c["name"] for c in cards] == ["OK", "Dois", "Três", "Quatro"]
+        assert cards[1]["venue"] == "V"
+        assert cards[2]["days"] == "Dias 27"
+        assert cards[3]["link"] == "https://clubinhodeofertas.com.br/4"
+
+    def test_pagina_salva(self):
+        """Test the saved page (cards rendered client-side) parses without cards"""
+        scraper = pytest.importorskip("app.services.scraper_clubinho")
+        path = os.path.join(os.path.dirname(__file__), "..", "index.html")
+        with open(path, encoding="utf-8") as f:
+            assert scraper.parse_cards(f.read()) == []
+
+
+class TestScrapeAll:
+    def test_falha_ao_abrir_navegador(self, monkeypatch):
+        """Test a browser that fails to start is reported per category"""
+        scraper = pytest.importorskip("app.services.scraper_clubinho")
+
+        def falha():
+            raise RuntimeError("chrome indisponível")
+
+        monkeypatch.setattr(scraper, "start_driver", falha)
+        erros = []
+        assert scraper.scrape_all(lambda cat, total, erro: erros.append(erro), pool_size=2) == []
+        assert erros == ["chrome indisponível"] * len(scraper.CATEGORIES)
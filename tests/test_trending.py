@@ -0,0 +1,9 @@
+from datetime import datetime
+from app.services.trending import bucket_start
+
+
+class TestTrending:
+    def test_bucket_start_em_utc(self):
+        """Test buckets round naive UTC datetimes without the local timezone"""
+        assert bucket_start(datetime(2026, 3, 8, 2, 59, 59)) == datetime(2026, 3, 8, 2)
+        assert bucket_start(datetime(2026, 10, 19, 23, 0)) == datetime(2026, 10, 19, 23)